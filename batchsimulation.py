@@ -0,0 +1,192 @@
+""" Vectorized NumPy engine. Deals whole blocks of rounds at once as arrays of card ids (see card.py),
+    evaluates every 7 card hand with lookups into the evaluator tables and counts wins/ties with array ops.
+    Produces the same counts as playing PlayPokerRound one round at a time, without any per-round objects """
+import numpy as np
+import evaluator
+from canonical import HAND_CLASSES, hand_class
+from results import SimulationCounts
+
+BLOCK_SIZE = 20000 # rounds dealt per block, bounds memory at roughly BLOCK_SIZE * 52 int64s
+
+_tables = None
+
+
+def get_tables():
+    """ Returns the evaluator tables as arrays: (rank_keys, rank_strengths, flush_table, card_primes, card_bits).
+        rank_keys is sorted so prime products can be looked up with np.searchsorted. Built on first use """
+    global _tables
+    if _tables is None:
+        rank_table, flush_table = evaluator.load_tables()
+        keys = np.array(sorted(rank_table), dtype=np.int64)
+        strengths = np.array([rank_table[key] for key in keys.tolist()], dtype=np.int64)
+        _tables = (keys,
+                   strengths,
+                   np.array(flush_table, dtype=np.int64),
+                   np.array(evaluator.CARD_PRIMES, dtype=np.int64),
+                   np.array(evaluator.CARD_BITS, dtype=np.int64))
+    return _tables
+
+
+def evaluate_array(cards):
+    """ Strengths of many 7 card hands at once. `cards` is an int array of card ids with shape (..., 7),
+        returns an int64 array of shape (...) with the same values evaluator.evaluate_ids gives """
+    rank_keys, rank_strengths, flush_table, card_primes, card_bits = get_tables()
+    product = np.prod(card_primes[cards], axis=-1)
+    strength = rank_strengths[np.searchsorted(rank_keys, product)]
+
+    bits = card_bits[cards]
+    suits = cards // 13
+    for suit in range(4):
+        # Cards of one suit have distinct ranks, so summing their bits is the same as or-ing them
+        rankmask = np.where(suits == suit, bits, 0).sum(axis=-1)
+        strength = np.maximum(strength, flush_table[rankmask])
+    return strength
+
+
+def evaluate_seats(hole, board, opponent_holes):
+    """ (hero (n,), opponents (n, k)) strengths of n rounds: player1 holds `hole`, card ids of shape (2,) for the
+        same cards every round or (n, 2), the k opponents hold opponent_holes (n, k, 2) and `board` is (n, 5) """
+    n, num_opponents = opponent_holes.shape[:2]
+    hero = evaluate_array(np.concatenate([np.broadcast_to(hole, (n, 2)), board], axis=1))
+    opponent_cards = np.concatenate([opponent_holes, np.broadcast_to(board[:, None, :], (n, num_opponents, 5))], axis=2)
+    return hero, evaluate_array(opponent_cards)
+
+
+def count_outcomes(hero, opponents):
+    """ Counts (wins, ties) for player1 given its strengths (n,) and the opponents' strengths (n, num_opponents).
+        A tie is a round where player1 shares the best hand """
+    best_opponent = opponents.max(axis=1)
+    return int(np.count_nonzero(hero > best_opponent)), int(np.count_nonzero(hero == best_opponent))
+
+
+def showdown(strengths):
+    """ Pot share of every seat from strengths of shape (n, seats): 1 for the only best hand, 1 / k for each
+        of k best hands that split, 0 for the rest """
+    winners = strengths == strengths.max(axis=1, keepdims=True)
+    return winners / winners.sum(axis=1, keepdims=True)
+
+
+def simulate_all_seats(num_players, n_rounds, rng=None, block_size=BLOCK_SIZE):
+    """ Deals n_rounds rounds of random hands to all num_players seats and credits every seat's outcome to its
+        pre-flop hand class, so one round gives a sample for each seat instead of only player1.
+        Returns {hand class index (canonical.hand_class): SimulationCounts}, ties being split pots """
+    rng = np.random.default_rng(rng)
+    num_classes = len(HAND_CLASSES)
+    wins = np.zeros(num_classes, dtype=np.int64)
+    ties = np.zeros(num_classes, dtype=np.int64)
+    rounds = np.zeros(num_classes, dtype=np.int64)
+    deck = np.arange(52, dtype=np.int64)
+
+    done = 0
+    while done < n_rounds:
+        n = min(block_size, n_rounds - done)
+        dealt = rng.permuted(np.broadcast_to(deck, (n, 52)), axis=1)[:, :2 * num_players + 5]
+        holes = dealt[:, :2 * num_players].reshape(n, num_players, 2)
+        board = np.broadcast_to(dealt[:, None, 2 * num_players:], (n, num_players, 5))
+        shares = showdown(evaluate_array(np.concatenate([holes, board], axis=2))).ravel()
+
+        classes = _class_table()[holes[:, :, 0], holes[:, :, 1]].ravel()
+        wins += np.bincount(classes, weights=shares == 1, minlength=num_classes).astype(np.int64)
+        ties += np.bincount(classes, weights=(shares > 0) & (shares < 1), minlength=num_classes).astype(np.int64)
+        rounds += np.bincount(classes, minlength=num_classes)
+        done += n
+    return {index: SimulationCounts(int(wins[index]), int(ties[index]), int(rounds[index])) for index in range(num_classes)}
+
+
+_classes = None
+
+
+def _class_table():
+    # (52, 52) array of the hand class index of every pair of card ids
+    global _classes
+    if _classes is None:
+        _classes = np.zeros((52, 52), dtype=np.int64)
+        for card1 in range(52):
+            for card2 in range(52):
+                if card1 != card2:
+                    _classes[card1, card2] = hand_class((card1, card2))
+    return _classes
+
+
+def simulate_ids(hole_ids, num_players, n_rounds, rng=None, block_size=BLOCK_SIZE, board_ids=(), dead_ids=()):
+    """ Plays n_rounds rounds for player1 holding the two card ids `hole_ids` against num_players - 1
+        random opponents and returns a SimulationCounts. `rng` is a numpy Generator or a seed.
+        `board_ids` are community cards that are already known, only the rest of the board is dealt,
+        and `dead_ids` are cards that are out of play """
+    return simulate_nested_ids(hole_ids, [num_players], n_rounds, rng, block_size, board_ids, dead_ids)[num_players]
+
+
+def simulate_nested_ids(hole_ids, player_counts, n_rounds, rng=None, block_size=BLOCK_SIZE, board_ids=(), dead_ids=()):
+    """ simulate_ids for several player counts from the same deals. Each round deals max(player_counts) - 1
+        opponents and a board once, and the table with k players is player1 against the first k - 1 of them,
+        so every player count reuses the board and all the hand strengths (common random numbers: the columns
+        differ only by the extra seats). Returns {num_players: SimulationCounts} """
+    rng = np.random.default_rng(rng)
+    num_opponents = max(player_counts) - 1
+    needed = 2 * num_opponents + 5 - len(board_ids)
+    known = set(hole_ids) | set(board_ids) | set(dead_ids)
+    remaining = np.array([cardid for cardid in range(52) if cardid not in known], dtype=np.int64)
+    hole = np.array(hole_ids, dtype=np.int64)
+    known_board = np.array(board_ids, dtype=np.int64)
+
+    counts = {num_players: SimulationCounts() for num_players in player_counts}
+    done = 0
+    while done < n_rounds:
+        n = min(block_size, n_rounds - done)
+        # Each row is an independent shuffle of the cards left, the first `needed` are dealt
+        dealt = rng.permuted(np.broadcast_to(remaining, (n, remaining.size)), axis=1)[:, :needed]
+        board = dealt[:, 2 * num_opponents:]
+        if known_board.size:
+            board = np.concatenate([np.broadcast_to(known_board, (n, known_board.size)), board], axis=1)
+
+        hero, opponents = evaluate_seats(hole, board, dealt[:, :2 * num_opponents].reshape(n, num_opponents, 2))
+        # best_opponent[:, k - 1] = best hand among the first k opponents
+        best_opponent = np.maximum.accumulate(opponents, axis=1)
+
+        for num_players, cell in counts.items():
+            best = best_opponent[:, num_players - 2]
+            cell.add(SimulationCounts(int(np.count_nonzero(hero > best)), int(np.count_nonzero(hero == best)), n))
+        done += n
+    return counts
+
+
+def simulate_stacked(queries, num_players, rng=None, block_size=BLOCK_SIZE):
+    """ simulate_ids for several different queries at once. `queries` is a list of (hole_ids, board_ids, dead_ids,
+        n_rounds) that all have num_players players and the same number of known board cards; their rounds are
+        stacked into the same blocks, so a batch of small queries makes a few large evaluate_array calls instead of
+        one small call each. Returns a SimulationCounts per query """
+    rng = np.random.default_rng(rng)
+    num_opponents = num_players - 1
+    known_cards = len(queries[0][1])
+    needed = 2 * num_opponents + 5 - known_cards
+    holes = np.array([hole_ids for hole_ids, board_ids, dead_ids, n_rounds in queries], dtype=np.int64).reshape(-1, 2)
+    boards = np.array([board_ids for hole_ids, board_ids, dead_ids, n_rounds in queries], dtype=np.int64)
+    boards = boards.reshape(len(queries), known_cards)
+    known = np.zeros((len(queries), 52), dtype=bool)
+    for row, (hole_ids, board_ids, dead_ids, n_rounds) in enumerate(queries):
+        known[row, list(hole_ids) + list(board_ids) + list(dead_ids)] = True
+    # Query of every stacked round
+    owners = np.repeat(np.arange(len(queries)), [n_rounds for hole_ids, board_ids, dead_ids, n_rounds in queries])
+
+    wins = np.zeros(len(queries), dtype=np.int64)
+    ties = np.zeros(len(queries), dtype=np.int64)
+    for start in range(0, owners.size, block_size):
+        owner = owners[start:start + block_size]
+        n = owner.size
+        # Sorting random keys with each row's known cards pushed to the end shuffles the cards left to that query
+        keys = rng.random((n, 52))
+        keys[known[owner]] = 2
+        dealt = np.argsort(keys, axis=1)[:, :needed]
+        board = np.concatenate([boards[owner], dealt[:, 2 * num_opponents:]], axis=1)
+
+        hero, opponents = evaluate_seats(holes[owner], board, dealt[:, :2 * num_opponents].reshape(n, num_opponents, 2))
+        best = opponents.max(axis=1)
+        wins += np.bincount(owner, weights=hero > best, minlength=len(queries)).astype(np.int64)
+        ties += np.bincount(owner, weights=hero == best, minlength=len(queries)).astype(np.int64)
+    return [SimulationCounts(int(wins[row]), int(ties[row]), query[3]) for row, query in enumerate(queries)]
+
+
+def simulate(holecards, num_players, n_rounds, rng=None, block_size=BLOCK_SIZE):
+    """ Same as simulate_ids for a Player's hole cards (the keys main() uses) """
+    card1, card2 = holecards.get_cards()
+    return simulate_ids((card1.id, card2.id), num_players, n_rounds, rng, block_size)
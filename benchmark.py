@@ -0,0 +1,188 @@
+""" Benchmarks for the hot paths: hand evaluation, dealing and the end-to-end sweep.
+    Every benchmark runs a fixed amount of work with fixed seeds and reports throughput (operations per second,
+    best of `repeat` runs) and the peak memory traced while doing it. Results are written as JSON and compared
+    against a stored baseline, and the run exits with status 1 when a benchmark got slower than the tolerance.
+
+    python3 benchmark.py                          run everything and compare with benchmark_baseline.json
+    python3 benchmark.py --save-baseline          store this run as the new baseline
+    python3 benchmark.py --quick --output out.json
+    The startup benchmarks time fresh interpreters importing the modules, so short scripted calls stay fast """
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from card import CARDS
+from deck import Deck
+from player import Player
+from playpokerround import PlayPokerRound
+import batchsimulation
+import evaluator
+import main
+
+BASELINE = "benchmark_baseline.json"
+TOLERANCE = 0.2 # a benchmark regresses when it is more than 20% slower than the baseline
+SEED = 1234
+
+
+def random_hands(count, size=7):
+    rng = random.Random(SEED)
+    return [rng.sample(range(52), size) for _ in range(count)]
+
+
+def bench_get_best_poker_hand(count):
+    hands = random_hands(count)
+    players = []
+    for hand in hands:
+        player = Player(CARDS[hand[0]], CARDS[hand[1]])
+        player.get_sevencards([CARDS[cardid] for cardid in hand[2:]])
+        players.append(player)
+    return lambda: [player.get_best_poker_hand() for player in players]
+
+
+def bench_evaluate(count):
+    hands = [[CARDS[cardid] for cardid in hand] for hand in random_hands(count)]
+    return lambda: [evaluator.evaluate(hand) for hand in hands]
+
+
+def bench_evaluate_array(count):
+    hands = np.array(random_hands(count))
+    batchsimulation.get_tables()
+    return lambda: batchsimulation.evaluate_array(hands)
+
+
+def bench_deal(count, num_players=6):
+    player1 = Player(CARDS[12], CARDS[25])
+    def run():
+        pokerround = PlayPokerRound(num_players, player1, Deck(random.Random(SEED)))
+        for _ in range(count):
+            pokerround.deal()
+    return run
+
+
+def bench_get_handvalues(count, num_players=10):
+    # Evaluating every seat of already dealt rounds, the board work is shared through evaluator.BoardState
+    rng = random.Random(SEED)
+    rounds = []
+    for _ in range(count):
+        pokerround = PlayPokerRound(num_players, Player(CARDS[12], CARDS[25]), Deck(rng))
+        pokerround.deal()
+        rounds.append(pokerround)
+    return lambda: [pokerround.get_handvalues() for pokerround in rounds]
+
+
+def bench_import(count, code):
+    # Fresh interpreters running `code`, for startup time. The first one, untimed, fills the evaluator table cache
+    command = [sys.executable, "-c", code]
+    subprocess.run(command, check=True)
+    return lambda: [subprocess.run(command, check=True) for _ in range(count)]
+
+
+def bench_main(num_simulations, engine):
+    # One full 169 hand x 9 player count table, so rounds = 169 * 9 * num_simulations
+    def run():
+        with contextlib.redirect_stdout(sys.stderr): # main() prints "done", keep stdout for the JSON report
+            main.main(num_simulations, engine, seed=SEED)
+    return run
+
+
+def get_benchmarks(quick=False):
+    """ Returns [(name, unit, operations per run, setup)] where setup() prepares the data and returns the function to time """
+    scale = 1 if quick else 5
+    evaluations = 1000 * scale
+    return [
+        ("player.get_best_poker_hand", "hands/s", evaluations, lambda: bench_get_best_poker_hand(evaluations)),
+        ("evaluator.evaluate", "hands/s", 10 * evaluations, lambda: bench_evaluate(10 * evaluations)),
+        ("batchsimulation.evaluate_array", "hands/s", 100 * evaluations, lambda: bench_evaluate_array(100 * evaluations)),
+        ("playpokerround.deal", "rounds/s", 2 * evaluations, lambda: bench_deal(2 * evaluations)),
+        ("playpokerround.get_handvalues", "seats/s", 10 * evaluations, lambda: bench_get_handvalues(evaluations)),
+        ("startup core + tables", "starts/s", 5, lambda: bench_import(5, "import playpokerround, evaluator; evaluator.load_tables()")),
+        ("startup main", "starts/s", 5, lambda: bench_import(5, "import main")),
+        ("main object engine", "rounds/s", 169 * 9 * 2 * scale, lambda: bench_main(2 * scale, "object")),
+        ("main vectorized engine", "rounds/s", 169 * 9 * 20 * scale, lambda: bench_main(20 * scale, "vectorized")),
+    ]
+
+
+def measure(setup, operations, repeat):
+    """ Returns (best operations per second, peak traced memory in bytes) """
+    run = setup()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    # tracemalloc slows allocation down, so memory is traced in a separate run that isn't timed
+    run = setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return operations / best, peak
+
+
+def run_benchmarks(quick=False, repeat=3, names=None):
+    results = {}
+    for name, unit, operations, setup in get_benchmarks(quick):
+        if names and name not in names:
+            continue
+        rate, peak = measure(setup, operations, repeat)
+        results[name] = {"unit": unit, "rate": rate, "peak_memory_bytes": peak}
+        print(f"{name:32} {rate:14,.0f} {unit:9} peak {peak / 2**20:8.2f} MiB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """ Returns [(name, rate, baseline rate)] for every benchmark that is more than `tolerance` slower than the baseline """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["rate"] < baseline[name]["rate"] * (1 - tolerance):
+            regressions.append((name, result["rate"], baseline[name]["rate"]))
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the evaluator, dealer and end-to-end sweep")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, for a fast check")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best one counts")
+    parser.add_argument("--only", action="append", help="run only this benchmark (can be repeated)")
+    parser.add_argument("--output", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.repeat, args.only)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # kilobytes on Linux
+    report = json.dumps({"quick": args.quick, "seed": SEED, "max_rss_bytes": max_rss, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(report)
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("quick") != args.quick:
+        print("Baseline was recorded with a different --quick setting, not comparing", file=sys.stderr)
+        return 0
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for name, rate, baseline_rate in regressions:
+        print(f"REGRESSION {name}: {rate:,.0f} vs baseline {baseline_rate:,.0f}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
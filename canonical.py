@@ -0,0 +1,50 @@
+""" Suit-isomorphism canonicalization of equity queries. Equity doesn't change when suits are relabelled
+    (AhKh on a 2h7c9d board plays exactly like AsKs on 2s7h9c), so every query is mapped to one representative:
+    the smallest (hole cards, board) over all 24 suit relabellings, with the cards of each sorted """
+import itertools
+from card import RANK_CHARS, card_rank, permute_suits
+from deck import Deck
+
+SUIT_PERMUTATIONS = list(itertools.permutations(range(4)))
+
+
+def canonical_key(hole_ids, board_ids=(), num_players=2):
+    """ Returns (hole card ids, board ids, num_players) for the suit-normalized form of a query.
+        Isomorphic queries get equal keys, and the key can be simulated directly """
+    best = None
+    for permutation in SUIT_PERMUTATIONS:
+        hole = tuple(sorted(permute_suits(cardid, permutation) for cardid in hole_ids))
+        board = tuple(sorted(permute_suits(cardid, permutation) for cardid in board_ids))
+        if best is None or (hole, board) < best:
+            best = (hole, board)
+    return best[0], best[1], num_players
+
+
+def hand_class_key(hole_ids):
+    # (low rank, high rank, suited) identifies one of the 169 pre-flop hand classes
+    card1, card2 = hole_ids
+    low, high = sorted((card_rank(card1), card_rank(card2)))
+    return low, high, card1 // 13 == card2 // 13
+
+
+def _build_hand_classes():
+    deck = Deck()
+    deck.get_uniqueholecards()
+    return {hand_class_key((player.card1.id, player.card2.id)): index for index, player in enumerate(deck.uniqueholecards)}
+
+
+HAND_CLASSES = _build_hand_classes()
+
+
+def hand_class(hole_ids):
+    """ Canonical hand ID: the index (0-168) of the hole cards' class in Deck.get_uniqueholecards order """
+    return HAND_CLASSES[hand_class_key(hole_ids)]
+
+
+def hand_label(hole_ids):
+    """ Name of the hole cards' class: "AA", "AKs" or "AKo" """
+    low, high, suited = hand_class_key(hole_ids)
+    label = RANK_CHARS[high - 2] + RANK_CHARS[low - 2]
+    if low == high:
+        return label
+    return label + ("s" if suited else "o")
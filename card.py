@@ -1,7 +1,53 @@
+SUITS = ["heart", "diamond", "spade", "club"]
+RANKS = [num for num in range(2, 15)] # 14 = Ace, 13 = King
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+RANK_CHARS = "23456789TJQKA"
+SUIT_CHARS = "hdsc" # same order as SUITS
+
+# Cards are also encoded as integers 0..51: cardid = suit index * 13 + (rank - 2),
+# the same order Deck lays out its 52 cards in
+
+
+def card_id(suit, rank):
+    return SUIT_INDEX[suit] * 13 + rank - 2
+
+
+def card_rank(cardid):
+    return cardid % 13 + 2
+
+
+def card_suit(cardid):
+    return SUITS[cardid // 13]
+
+
+def parse_card(text):
+    """ Card id of a two character card name, rank then suit (ex: "Ah", "Td", "2c") """
+    if len(text) != 2 or text[0].upper() not in RANK_CHARS or text[1].lower() not in SUIT_CHARS:
+        raise ValueError(f"Can't read card {text!r}, expected a rank from {RANK_CHARS} and a suit from {SUIT_CHARS}")
+    return SUIT_CHARS.index(text[1].lower()) * 13 + RANK_CHARS.index(text[0].upper())
+
+
+def parse_cards(text):
+    # "AhKd" or "Ah Kd" or "Ah,Kd" -> list of card ids
+    text = text.replace(" ", "").replace(",", "")
+    return [parse_card(text[i:i + 2]) for i in range(0, len(text), 2)]
+
+
+def permute_suits(cardid, permutation):
+    # Relabels the suit of a card id, permutation[old suit index] = new suit index
+    return permutation[cardid // 13] * 13 + cardid % 13
+
+
 class Card:
+    __slots__ = ("suit", "rank", "id")
+
     def __init__(self, suit, rank):
         self.suit = suit
         self.rank = rank
+        self.id = card_id(suit, rank)
     
     def print_card(self):
-        print(f'{self.rank}{self.suit}' )
\ No newline at end of file
+        print(f'{self.rank}{self.suit}' )
+
+
+CARDS = [Card(card_suit(cardid), card_rank(cardid)) for cardid in range(52)] # One shared Card per card id
@@ -0,0 +1,77 @@
+""" Checkpointed, resumable sweeps. The raw per-cell counts of a run are saved as an equity table (see
+    equitytable.py) every few seconds and when the run stops, even on Ctrl-C or an error. Running again with the
+    same path picks up where the checkpoint left off, and add=True puts more rounds on top of an existing table """
+import os
+import time
+import numpy as np
+from canonical import hand_class
+from equitytable import EquityTable, write_table
+from results import SimulationCounts
+import sweep
+
+CHECKPOINT_SECONDS = 60
+
+
+def load_counts(path):
+    """ Returns {(num_players, hand class): SimulationCounts} from an equity table, or {} when `path` doesn't exist """
+    if not os.path.exists(path):
+        return {}
+    table = EquityTable(path)
+    counts = {}
+    for num_players in range(table.min_players, table.max_players + 1):
+        for index, (wins, ties, rounds) in enumerate(table.counts[:, num_players - table.min_players].tolist()):
+            counts[num_players, index] = SimulationCounts(wins, ties, rounds)
+    return counts
+
+
+def save_counts(path, counts):
+    # Cells not simulated yet are saved as zero rounds. Written next to `path` then renamed over it,
+    # so a crash mid-write never leaves a broken checkpoint behind
+    temporary = path + ".tmp"
+    write_table(temporary, counts)
+    os.replace(temporary, path)
+
+
+def run_checkpointed(path, holecards, num_simulations, engine="vectorized", seed=None, workers=1, chunksize=1,
+                     player_counts=sweep.PLAYER_COUNTS, add=False, checkpoint_seconds=CHECKPOINT_SECONDS, progress=None,
+                     target_halfwidth=None, batch_size=sweep.BATCH_SIZE):
+    """ Same as sweep.run_sweep, but keeps the counts at `path`. Cells already holding num_simulations rounds are
+        skipped and partly done ones are topped up, so an interrupted run resumes. With add=True every cell gets
+        num_simulations more rounds merged into its existing counts instead.
+        Only the player counts asked for are simulated, other columns in the file (including the zero round ones
+        write_table pads between them) are kept as they are.
+        Returns every cell in the file, keyed (num_players, hand class) like an equity table.
+        With a target_halfwidth cells run adaptively like in sweep.run_sweep, num_simulations being the most rounds
+        per cell, and a cell whose saved counts are already that narrow is left alone.
+        `progress(counts)` is called with the new counts of each cell simulated by this run """
+    sweep.check_engine(engine, target_halfwidth=target_halfwidth)
+    if engine == "all-seats":
+        raise ValueError("Checkpointed runs top up cells one at a time, the all-seats engine isn't supported")
+    counts = load_counts(path)
+    entropy = np.random.SeedSequence(seed).entropy
+
+    keys = []
+    cells = []
+    for num_players in sorted(player_counts):
+        for index in range(len(holecards)):
+            key = (num_players, hand_class((holecards[index].card1.id, holecards[index].card2.id)))
+            done = counts.setdefault(key, SimulationCounts())
+            remaining = num_simulations if add else num_simulations - done.rounds
+            narrow = target_halfwidth is not None and done.rounds and done.halfwidth() <= target_halfwidth
+            if remaining > 0 and not (narrow and not add):
+                keys.append(key)
+                cells.append(sweep.make_cell(holecards, num_players, index, remaining, engine, entropy, done.rounds,
+                                             target_halfwidth, batch_size))
+
+    last_save = time.monotonic()
+    try:
+        for key, result in zip(keys, sweep.run_cells(cells, workers, chunksize)):
+            counts[key].add(result)
+            if progress is not None:
+                progress(result)
+            if time.monotonic() - last_save >= checkpoint_seconds:
+                save_counts(path, counts)
+                last_save = time.monotonic()
+    finally:
+        save_counts(path, counts)
+    return counts
@@ -1,15 +1,28 @@
-from card import Card
+import random
+from card import Card, CARDS, SUITS, RANKS
 from player import Player
 
 class Deck:
     """ Initalizes 52 card deck. 
-        Also creates a list of the 169 unique hole cards that a player can be dealt """
-    def __init__(self):
-        self.suits = ["heart", "diamond", "spade", "club"]
-        self.ranks = [num for num in range(2, 15)] # 14 = Ace, 13 = King
-        self.deck = [Card(s, r) for s in self.suits for r in self.ranks]
+        Also creates a list of the 169 unique hole cards that a player can be dealt 
+        The deck is a preallocated buffer of card ids (see card.py). Cards in self.cards[:self.dealt] have
+        been dealt or removed, the rest are still in the deck. Dealing is a partial Fisher-Yates shuffle, so each
+        card costs one random draw and one swap, and reset() makes the whole deck available again without allocating.
+        Cards are drawn from `rng`, a random.Random (default: the random module), so a seeded rng gives the same deals """
+    def __init__(self, rng=None):
+        self.rng = random if rng is None else rng
+        self.suits = SUITS
+        self.ranks = RANKS
+        self.cards = list(range(52))
+        self.position = list(range(52)) # position[cardid] = index of cardid in self.cards
+        self.dealt = 0
         self.uniqueholecards = None
 
+    @property
+    def deck(self):
+        # Card objects still in the deck
+        return [CARDS[cardid] for cardid in self.cards[self.dealt:]]
+
     def get_uniqueholecards(self):
         # Get list of unique hole cards. Don't want redundant values (ex: 2Heart 3Spade = 2Heart 3Club; both 2, 3 offsuit connector)
         # Want 78 offsuit, 78 same suit, 13 pairs (AA, KK, QQ, etc)
@@ -19,8 +32,54 @@ class Deck:
         suited = [Player(card1, card2) for i, card1 in enumerate(hearts) for card2 in hearts[i+1:]] # 78 same suit combinations
         self.uniqueholecards = offsuit + suited
 
+    def reset(self):
+        # Put every card back. The buffer is left in its shuffled order, which is fine for Fisher-Yates dealing
+        self.dealt = 0
+
+    def _take(self, cardid):
+        # Swap cardid to the front of the undealt part of the buffer and mark it dealt
+        index = self.position[cardid]
+        top = self.dealt
+        other = self.cards[top]
+        self.cards[top] = cardid
+        self.cards[index] = other
+        self.position[cardid] = top
+        self.position[other] = index
+        self.dealt = top + 1
+
+    def remove_id(self, cardid):
+        if self.position[cardid] >= self.dealt:
+            self._take(cardid)
+
     def remove(self, card):
-        for deckcard in self.deck:
-            if deckcard.suit == card.suit and deckcard.rank == card.rank:
-                del card 
-                break
\ No newline at end of file
+        self.remove_id(card.id)
+
+    def deal_id(self):
+        # Deal one uniformly random card id from the cards left in the deck
+        cardid = self.cards[self.rng.randrange(self.dealt, 52)]
+        self._take(cardid)
+        return cardid
+
+    def deal_ids(self, count):
+        """ Deals `count` card ids in one call, the bulk version of deal_id for everything a round needs.
+            Same partial Fisher-Yates shuffle, with the buffer in locals and one rng.random() per card """
+        cards = self.cards
+        position = self.position
+        rand = self.rng.random
+        top = self.dealt
+        dealt = cards[top:top + count]
+        for i in range(count):
+            index = top + int(rand() * (52 - top))
+            cardid = cards[index]
+            other = cards[top]
+            cards[top] = cardid
+            cards[index] = other
+            position[cardid] = top
+            position[other] = index
+            dealt[i] = cardid
+            top += 1
+        self.dealt = top
+        return dealt
+
+    def deal_card(self):
+        return CARDS[self.deal_id()]
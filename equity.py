@@ -0,0 +1,65 @@
+""" Board-aware equity queries. Given player1's hole cards, the community cards known so far (0-5), any dead
+    cards and the number of players, only the cards that are still unknown are simulated, so flop, turn and river
+    decisions are answered quickly. Cards can be given as a string ("AhKd"), card ids or Card objects.
+
+    equity("AhKh", board="Qh Jh 2c", dead="9h", num_players=3).win_probability() """
+import operator
+from card import CARDS, Card, parse_cards
+from player import Player
+import batchsimulation
+import exact
+import sweep
+
+
+def to_ids(cards):
+    """ Card ids of a string, or of a sequence of Card objects and card ids. ValueError for anything else and for
+        ids outside 0-51 """
+    if isinstance(cards, str):
+        return parse_cards(cards)
+    ids = []
+    for card in cards:
+        if isinstance(card, Card):
+            ids.append(card.id)
+            continue
+        try:
+            cardid = operator.index(card)
+        except TypeError:
+            raise ValueError(f"Expected a card id, got {card!r}") from None
+        if not 0 <= cardid < 52:
+            raise ValueError(f"Card ids go from 0 to 51, got {cardid}")
+        ids.append(cardid)
+    return ids
+
+
+def check_cards(hole, board=(), dead=(), num_players=2):
+    """ Returns (hole, board, dead) as lists of card ids, or raises ValueError when they can't make a round """
+    if num_players < 2:
+        raise ValueError(f"A round needs at least 2 players, got {num_players}")
+    hole, board, dead = to_ids(hole), to_ids(board), to_ids(dead)
+    known = hole + board + dead
+    if len(hole) != 2:
+        raise ValueError(f"Expected 2 hole cards, got {len(hole)}")
+    if len(board) > 5:
+        raise ValueError(f"A board has at most 5 cards, got {len(board)}")
+    if len(set(known)) != len(known):
+        raise ValueError("The same card appears twice in the hole cards, board and dead cards")
+    if 2 * (num_players - 1) + 5 - len(board) > 52 - len(known):
+        raise ValueError(f"Not enough cards left to deal {num_players} players")
+
+    return hole, board, dead
+
+
+def equity(hole, board=(), dead=(), num_players=2, n_rounds=10000, engine="vectorized", rng=None):
+    """ Returns a SimulationCounts for player1 holding `hole` against num_players - 1 random hands.
+        engine = "vectorized" (batchsimulation), "object" (PlayPokerRound, one round at a time) or "exact"
+        (enumerates every runout and opponent hand, heads-up only, n_rounds is ignored) """
+    hole, board, dead = check_cards(hole, board, dead, num_players)
+    if engine == "vectorized":
+        return batchsimulation.simulate_ids(hole, num_players, n_rounds, rng, board_ids=board, dead_ids=dead)
+    elif engine == "exact":
+        return exact.exact_equity(hole, board, num_players, dead_ids=dead)
+    elif engine == "object":
+        player1 = Player(CARDS[hole[0]], CARDS[hole[1]])
+        return sweep.play_rounds(player1, num_players, n_rounds, board=[CARDS[cardid] for cardid in board],
+                                 dead=[CARDS[cardid] for cardid in dead], rng=sweep.python_random(rng))
+    raise ValueError(f"Unknown engine {engine!r}, expected 'vectorized', 'object' or 'exact'")
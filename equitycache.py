@@ -0,0 +1,51 @@
+from collections import OrderedDict
+import numpy as np
+import batchsimulation
+from canonical import canonical_key
+
+class EquityCache:
+    """ Memoizes equity queries. Requests are keyed on their canonical form (see canonical.py) plus the
+        number of rounds, so repeated and suit-isomorphic queries are answered from the cache instead of being
+        simulated again. Holds at most `maxsize` results and drops the least recently used one when full.
+        `simulate(hole_ids, board_ids, num_players, n_rounds, rng)` computes a miss, by default with batchsimulation """
+    def __init__(self, maxsize=4096, simulate=None, rng=None):
+        self.maxsize = maxsize
+        self.simulate = simulate or self.simulate_batch
+        self.rng = np.random.default_rng(rng)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def simulate_batch(hole_ids, board_ids, num_players, n_rounds, rng):
+        return batchsimulation.simulate_ids(hole_ids, num_players, n_rounds, rng, board_ids=board_ids)
+
+    def get_equity(self, hole_ids, board_ids=(), num_players=2, n_rounds=10000):
+        """ Returns a SimulationCounts for player1 holding `hole_ids` with the known `board_ids` """
+        hole, board, num_players = canonical_key(hole_ids, board_ids, num_players)
+        counts = self.lookup(hole, board, num_players, n_rounds)
+        if counts is None:
+            counts = self.simulate(hole, board, num_players, n_rounds, self.rng)
+            self.store(hole, board, num_players, n_rounds, counts)
+        return counts
+
+    def lookup(self, hole, board, num_players, n_rounds):
+        """ Cached counts of an already canonical query, or None (counted as a miss) for callers that simulate
+            misses themselves and hand them to store() """
+        key = (hole, board, num_players, n_rounds)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def store(self, hole, board, num_players, n_rounds, counts):
+        self.entries[(hole, board, num_players, n_rounds)] = counts
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
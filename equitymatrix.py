@@ -0,0 +1,212 @@
+""" Pre-flop hand vs hand equity matrix. Entry [A, B] holds, over every deal of hand class A against hand class B
+    (all combos of both that don't share a card, on all boards), how often A wins, ties and how many deals were
+    counted. Suit combos are weighted by how many of them can actually meet, so AKs vs AA counts the 3 AA combos
+    that fit next to each AKs combo. Hand classes are numbered in Deck.get_uniqueholecards order (canonical.hand_class).
+
+    The matrix is computed once (build_matrix, or  python3 equitymatrix.py --boards 20000 -o preflop.pkmx), stored
+    in the same style as equitytable.py: a 32 byte header and uint32 counts [A][B][wins, ties, deals], memory-mapped
+    when opened. Queries are then array lookups and one weighted sum:
+
+    matrix = EquityMatrix("preflop.pkmx")
+    matrix.equity("AKs", "QQ")                     # class vs class
+    matrix.equity("AhKh", "QQ+,AKo")               # hand vs range, by weighted reduction over the matrix
+                                                   # (range combos holding Ah or Kh are removed first)
+
+    Building it deals random boards and, on each board, settles all 1326 x 1326 combo pairs at once: combos are
+    sorted by strength, cumulative per-class counts give every combo's wins and ties against each class, and the
+    pairs that share a card are subtracted afterwards """
+import argparse
+import struct
+import sys
+import numpy as np
+from card import parse_cards
+from canonical import HAND_CLASSES, hand_class
+from handrange import HandRange, class_combos
+import batchsimulation
+
+MAGIC = b"PKMX"
+VERSION = 1
+HEADER = struct.Struct("<4sII20x") # magic, version, number of hand classes
+FIELDS = 3 # wins, ties, deals
+BOARDS = 20000 # boards dealt by the command line generator
+BLOCK_BOARDS = 64 # boards evaluated per NumPy block
+
+_combos = None
+
+
+def get_combos():
+    """ (combos, classes, pairs): the 1326 combos as an (1326, 2) card id array sorted by hand class, the class of
+        each one, and the (i, j) index arrays of every ordered pair of combos that share a card (i == j included) """
+    global _combos
+    if _combos is None:
+        combos = [combo for key in HAND_CLASSES for combo in class_combos(*key)]
+        classes = np.array([hand_class(combo) for combo in combos], dtype=np.int64)
+        combos = np.array(combos, dtype=np.int64)
+        holds = np.zeros((len(combos), 52), dtype=bool)
+        holds[np.arange(len(combos)), combos[:, 0]] = True
+        holds[np.arange(len(combos)), combos[:, 1]] = True
+        first, second = np.nonzero(holds.astype(np.int64) @ holds.T.astype(np.int64))
+        _combos = (combos, classes, (first, second))
+    return _combos
+
+
+def _count_board(strengths, valid, classes):
+    # wins[A, B], ties[A, B] of every valid combo against every valid combo on one board, card conflicts included
+    num_classes = len(HAND_CLASSES)
+    order = np.flatnonzero(valid)
+    order = order[np.argsort(strengths[order], kind="stable")]
+    ranked = strengths[order]
+    onehot = np.zeros((len(order), num_classes), dtype=np.float32) # counts stay far below 2**24, so float32 is exact
+    onehot[np.arange(len(order)), classes[order]] = 1
+    cumulative = np.zeros((len(order) + 1, num_classes), dtype=np.float32)
+    np.cumsum(onehot, axis=0, out=cumulative[1:])
+
+    # Combos of each class strictly weaker than each combo, and those exactly as strong
+    below = cumulative[np.searchsorted(ranked, ranked, side="left")]
+    equal = cumulative[np.searchsorted(ranked, ranked, side="right")] - below
+    both = onehot.T @ np.hstack([below, equal])
+    return both[:, :num_classes], both[:, num_classes:], cumulative[-1]
+
+
+def count_boards(boards):
+    """ (wins, ties, deals) as (169, 169) float arrays for every pair of combos that can be dealt together on
+        each of `boards`, an (n, 5) array of card ids """
+    combos, classes, (first, second) = get_combos()
+    num_classes = len(HAND_CLASSES)
+    n = len(boards)
+    on_board = np.zeros((n, 52), dtype=bool)
+    on_board[np.arange(n)[:, None], boards] = True
+    valid = ~(on_board[:, combos[:, 0]] | on_board[:, combos[:, 1]])
+    cards = np.concatenate([np.broadcast_to(combos, (n, len(combos), 2)),
+                            np.broadcast_to(boards[:, None, :], (n, len(combos), 5))], axis=2)
+    # Combos that hit the board are ignored, evaluate seven distinct cards in their place
+    strengths = batchsimulation.evaluate_array(np.where(valid[..., None], cards, np.arange(7)))
+
+    wins = np.zeros((num_classes, num_classes))
+    ties = np.zeros((num_classes, num_classes))
+    deals = np.zeros((num_classes, num_classes))
+    for board in range(n):
+        board_wins, board_ties, valid_per_class = _count_board(strengths[board], valid[board], classes)
+        wins += board_wins
+        ties += board_ties
+        deals += np.outer(valid_per_class, valid_per_class)
+
+    # Take back the pairs counted above that hold the same card, they can't be dealt together
+    both = valid[:, first] & valid[:, second]
+    weaker = (both & (strengths[:, second] < strengths[:, first])).sum(axis=0)
+    same = (both & (strengths[:, second] == strengths[:, first])).sum(axis=0)
+    pair_cells = classes[first] * num_classes + classes[second]
+    size = num_classes * num_classes
+    wins -= np.bincount(pair_cells, weights=weaker, minlength=size).reshape(num_classes, num_classes)
+    ties -= np.bincount(pair_cells, weights=same, minlength=size).reshape(num_classes, num_classes)
+    deals -= np.bincount(pair_cells, weights=both.sum(axis=0), minlength=size).reshape(num_classes, num_classes)
+    return wins, ties, deals
+
+
+def build_matrix(n_boards, rng=None, block_boards=BLOCK_BOARDS):
+    """ Deals n_boards random boards and returns (wins, ties, deals), each a (169, 169) int64 array """
+    rng = np.random.default_rng(rng)
+    totals = [0, 0, 0]
+    done = 0
+    while done < n_boards:
+        n = min(block_boards, n_boards - done)
+        boards = rng.permuted(np.broadcast_to(np.arange(52), (n, 52)), axis=1)[:, :5]
+        totals = [total + counts for total, counts in zip(totals, count_boards(boards))]
+        done += n
+    return tuple(np.rint(total).astype(np.int64) for total in totals)
+
+
+def write_matrix(path, wins, ties, deals):
+    data = np.stack([wins, ties, deals], axis=-1)
+    if data.max() >= 2**32:
+        raise ValueError("Counts don't fit in 32 bits, build the matrix from fewer boards")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(HAND_CLASSES)))
+        f.write(data.astype("<u4").tobytes())
+
+
+def _as_hand(hand):
+    # Hole cards as a tuple of two card ids, anything else as a HandRange (a class label becomes its combos)
+    if isinstance(hand, str):
+        try:
+            hand = parse_cards(hand)
+        except ValueError:
+            return HandRange.parse(hand)
+    if hasattr(hand, "card1"):
+        return (hand.card1.id, hand.card2.id)
+    return hand if isinstance(hand, HandRange) else tuple(hand)
+
+
+def class_weights(hand, blockers=()):
+    """ Weight of every hand class (169,) for a class label ("AKs"), hole cards (card ids, "AhKh" or a Player),
+        a range string or a HandRange: the summed combo weights of each class divided by its number of combos,
+        so a full class counts 1 whatever its size (the matrix counts already weight classes by their combos).
+        Combos holding one of the card ids in `blockers` are left out. The matrix only knows classes, so hole
+        cards count as their class from there on """
+    hand = _as_hand(hand)
+    blockers = set(blockers)
+    weights = np.zeros(len(HAND_CLASSES))
+    if not isinstance(hand, HandRange):
+        if not blockers & set(hand):
+            weights[hand_class(hand)] = 1
+        return weights
+    combos, classes, pairs = get_combos()
+    sizes = np.bincount(classes, minlength=len(HAND_CLASSES))
+    for combo, weight in zip(hand.combos.tolist(), hand.weights.tolist()):
+        if not blockers & set(combo):
+            weights[hand_class(combo)] += weight
+    return weights / sizes
+
+
+class EquityMatrix:
+    """ Read-only view of an equity matrix file """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, num_hands = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} equity matrix")
+        self.counts = np.memmap(path, dtype="<u4", mode="r", offset=HEADER.size, shape=(num_hands, num_hands, FIELDS))
+        self._points = None
+
+    def get_matrix(self):
+        """ (169, 169) array of the equity (wins + ties / 2 per deal) of the row class against the column class """
+        points, deals = self._get_points()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return points / deals
+
+    def _get_points(self):
+        # (wins + ties / 2, deals) as floats, read from the file once
+        if self._points is None:
+            counts = np.asarray(self.counts, dtype=np.float64)
+            self._points = (counts[..., 0] + counts[..., 1] / 2, counts[..., 2])
+        return self._points
+
+    def equity(self, hero, villain):
+        """ Equity of `hero` against `villain`, each a hand class label, hole cards or a range (see class_weights).
+            Ranges are reduced as sum(w_A * w_B * points[A, B]) / sum(w_A * w_B * deals[A, B]), so classes are
+            weighted by the deals they can actually make against each other. When one side is specific hole cards,
+            the other side's combos holding those cards are removed first, and ValueError is raised if nothing is
+            left (ex: "AhKh" against "AhAd") """
+        points, deals = self._get_points()
+        hero, villain = _as_hand(hero), _as_hand(villain)
+        hero_cards = () if isinstance(hero, HandRange) else hero
+        villain_cards = () if isinstance(villain, HandRange) else villain
+        hero, villain = class_weights(hero, villain_cards), class_weights(villain, hero_cards)
+        total = hero @ deals @ villain
+        if total == 0:
+            raise ValueError("No deals between these hands, they always share a card")
+        return float(hero @ points @ villain / total)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pre-flop 169 x 169 hand vs hand equity matrix")
+    parser.add_argument("-b", "--boards", type=int, default=BOARDS, help=f"random boards to deal (default {BOARDS})")
+    parser.add_argument("-s", "--seed", type=int, help="seed for a reproducible matrix")
+    parser.add_argument("-o", "--output", default="preflop.pkmx", help="matrix file to write")
+    args = parser.parse_args(argv)
+    write_matrix(args.output, *build_matrix(args.boards, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,75 @@
+""" Compact binary equity table. A 32 byte header followed by uint32 counts laid out as
+    [hand class (0-168)][num_players - min_players][wins, ties, rounds], little endian. The counts are opened with
+    numpy.memmap, so a lookup is one index into the mapped file and opening a table reads nothing but the header.
+    Hand classes are numbered in Deck.get_uniqueholecards order (see canonical.hand_class) """
+import struct
+import numpy as np
+from canonical import HAND_CLASSES, hand_class
+from results import SimulationCounts
+
+MAGIC = b"PKEQ"
+VERSION = 1
+HEADER = struct.Struct("<4sIIII12x") # magic, version, number of hand classes, min players, max players
+FIELDS = 3 # wins, ties, rounds
+
+
+class EquityTable:
+    """ Read-only view of an equity table file """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, num_hands, min_players, max_players = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} equity table")
+        self.min_players = min_players
+        self.max_players = max_players
+        self.counts = np.memmap(path, dtype="<u4", mode="r", offset=HEADER.size,
+                                shape=(num_hands, max_players - min_players + 1, FIELDS))
+
+    def lookup(self, hole_ids, num_players):
+        """ Returns the SimulationCounts stored for the hole card ids against num_players - 1 opponents """
+        if not self.min_players <= num_players <= self.max_players:
+            raise KeyError(f"Table holds {self.min_players}-{self.max_players} players, not {num_players}")
+        wins, ties, rounds = self.counts[hand_class(hole_ids), num_players - self.min_players].tolist()
+        return SimulationCounts(wins, ties, rounds)
+
+    def win_probability(self, hole_ids, num_players):
+        return self.lookup(hole_ids, num_players).win_probability()
+
+
+def write_table(path, counts):
+    """ Writes {(num_players, hand class): SimulationCounts} (the layout sweep.run_sweep returns) to `path`.
+        The table covers every player count between the smallest and largest given, cells that are missing
+        are stored as 0 rounds """
+    player_counts = sorted({num_players for num_players, index in counts})
+    min_players, max_players = player_counts[0], player_counts[-1]
+    data = np.zeros((len(HAND_CLASSES), max_players - min_players + 1, FIELDS), dtype="<u4")
+    for num_players in range(min_players, max_players + 1):
+        for index in range(len(HAND_CLASSES)):
+            cell = counts.get((num_players, index))
+            if cell is not None:
+                data[index, num_players - min_players] = (cell.wins, cell.ties, cell.rounds)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(HAND_CLASSES), min_players, max_players))
+        f.write(data.tobytes())
+
+
+def counts_from_dataframe(df, num_simulations=5000):
+    """ Rebuilds per-cell counts from a main() DataFrame or an exported spreadsheet. Rows must be in
+        Deck.get_uniqueholecards order (main() writes them that way). Tables without a "Samples for N players"
+        column are assumed to have used num_simulations rounds per cell. Ties were never recorded, so they are 0 """
+    counts = {}
+    for num_players in range(2, 11):
+        column = "Win % for " + str(num_players) + " players"
+        if column not in df:
+            continue
+        samples = df.get("Samples for " + str(num_players) + " players")
+        for index, win_probability in enumerate(df[column]):
+            rounds = int(samples.iloc[index]) if samples is not None else num_simulations
+            counts[num_players, index] = SimulationCounts(round(win_probability * rounds), 0, rounds)
+    return counts
+
+
+def convert_excel(xlsx_path, table_path, num_simulations=5000):
+    """ Imports an old Excel results file (ex: pokerresults.xlsx) into a binary equity table """
+    import pandas as pd
+    write_table(table_path, counts_from_dataframe(pd.read_excel(xlsx_path), num_simulations))
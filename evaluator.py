@@ -0,0 +1,262 @@
+""" Lookup-table hand evaluator. Maps a 7 card hand straight to one integer strength so that
+    ordinary integer comparison decides which hand wins (higher strength = better hand).
+
+    A strength packs the hand rank (0 = high card ... 8 = straight flush, 9 = royal flush) above the
+    five ranks that make up the best hand, 4 bits each:  handrank << 20 | r1 << 16 | ... | r5
+    Two tables, loaded by load_tables() the first time a hand is evaluated:
+        RANK_TABLE: product of the rank primes of the cards -> strength (hands without a flush)
+        FLUSH_TABLE: 13 bit mask of the ranks held in one suit -> strength (0 when fewer than 5 ranks)
+    Building them takes most of a second, so they are also saved in a cache file (TABLE_CACHE) and later processes
+    read them from there in a few milliseconds """
+import array
+import itertools
+import os
+from card import card_rank
+
+# Set POKER_CACHE_DIR to move the table cache, or to an empty string to turn it off
+CACHE_DIR = os.environ.get("POKER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "poker-monte-carlo"))
+TABLE_CACHE = "evaluator-tables-v2.bin"
+# Hands whose strengths are stored in the cache header and looked up again when it is read, so a cache written
+# by code that packs strengths differently is rebuilt instead of being trusted
+CHECK_HANDS = [(2, 3, 4, 5, 7, 9, 11), (9, 9, 5, 5, 14, 2, 3), (5, 5, 5, 9, 9, 2, 3), (14, 14, 14, 14, 13, 2, 3),
+               (2, 3, 4, 5, 14, 9, 9), (6, 7, 8, 9, 10, 10, 10)]
+CHECK_FLUSHES = [0x1F00, 0x100F, 0x1554]
+
+PRIMES = {2: 2, 3: 3, 4: 5, 5: 7, 6: 11, 7: 13, 8: 17, 9: 19, 10: 23, 11: 29, 12: 31, 13: 37, 14: 41}
+CARD_PRIMES = [PRIMES[card_rank(cardid)] for cardid in range(52)] # indexed by card id
+CARD_BITS = [1 << (card_rank(cardid) - 2) for cardid in range(52)]
+
+
+def pack(handrank, ranks):
+    # Packs a hand rank and the five ranks of the hand into one integer strength
+    strength = handrank
+    for rank in ranks:
+        strength = (strength << 4) | rank
+    return strength
+
+
+def describe(strength):
+    """ Unpacks a strength into (handrank, hand), the hand rank (0-9) and the five card ranks of
+        the best hand (ace counts as 1 in a wheel) """
+    return strength >> 20, [(strength >> shift) & 15 for shift in (16, 12, 8, 4, 0)]
+
+
+def straight_high(rankmask):
+    # Returns the high card of the best straight in a 13 bit rank mask (bit 0 = 2, bit 12 = ace), or 0
+    if rankmask & 0x100F == 0x100F: # A 2 3 4 5 is the only straight that can't be found by shifting
+        wheel = 5
+    else:
+        wheel = 0
+    for high in range(14, 5, -1):
+        straight = 0x1F << (high - 6)
+        if rankmask & straight == straight:
+            return high
+    return wheel
+
+
+def _straight_ranks(high):
+    if high == 5:
+        return [5, 4, 3, 2, 1]
+    return list(range(high, high - 5, -1))
+
+
+def _flush_strength(rankmask):
+    # Best hand that can be made from the ranks of a single suit
+    high = straight_high(rankmask)
+    if high == 14:
+        return pack(9, _straight_ranks(high))
+    elif high:
+        return pack(8, _straight_ranks(high))
+    ranks = [rank for rank in range(14, 1, -1) if rankmask & (1 << (rank - 2))]
+    return pack(5, ranks[:5])
+
+
+def rank_strength(ranks):
+    """ Best hand that can be made from a list of 5 or more ranks, ignoring suits (no flushes).
+        Groups are ordered by size then rank, so [9, 9, 5, 5, 14] packs as two pair 9s and 5s, ace kicker """
+    counts = {}
+    rankmask = 0
+    for rank in ranks:
+        counts[rank] = counts.get(rank, 0) + 1
+        rankmask |= 1 << (rank - 2)
+    groups = sorted(((count, rank) for rank, count in counts.items()), reverse=True)
+    top_count, top_rank = groups[0]
+    second_count = groups[1][0] if len(groups) > 1 else 0
+    high = straight_high(rankmask)
+
+    if top_count >= 4:
+        kicker = max(rank for rank in counts if rank != top_rank)
+        return pack(7, [top_rank] * 4 + [kicker])
+    elif top_count == 3 and second_count >= 2:
+        return pack(6, [top_rank] * 3 + [groups[1][1]] * 2)
+    elif high:
+        return pack(4, _straight_ranks(high))
+    elif top_count == 3:
+        kickers = sorted((rank for rank in counts if rank != top_rank), reverse=True)
+        return pack(3, [top_rank] * 3 + kickers[:2])
+    elif top_count == 2 and second_count == 2:
+        pair1, pair2 = groups[0][1], groups[1][1]
+        kicker = max(rank for rank in counts if rank != pair1 and rank != pair2)
+        return pack(2, [pair1] * 2 + [pair2] * 2 + [kicker])
+    elif top_count == 2:
+        kickers = sorted((rank for rank in counts if rank != top_rank), reverse=True)
+        return pack(1, [top_rank] * 2 + kickers[:3])
+    return pack(0, sorted(counts, reverse=True)[:5])
+
+
+def _build_tables():
+    rank_table = {}
+    for ranks in itertools.combinations_with_replacement(range(2, 15), 7):
+        if any(ranks.count(rank) > 4 for rank in set(ranks)):
+            continue
+        rank_table[_prime_product(ranks)] = rank_strength(ranks)
+
+    flush_table = [0] * (1 << 13)
+    for rankmask in range(1 << 13):
+        if bin(rankmask).count("1") >= 5:
+            flush_table[rankmask] = _flush_strength(rankmask)
+    return rank_table, flush_table
+
+
+def _prime_product(ranks):
+    product = 1
+    for rank in ranks:
+        product *= PRIMES[rank]
+    return product
+
+
+def _fingerprint():
+    # Strengths of CHECK_HANDS and CHECK_FLUSHES as this code computes them
+    return [rank_strength(ranks) for ranks in CHECK_HANDS] + [_flush_strength(rankmask) for rankmask in CHECK_FLUSHES]
+
+
+def _read_cache(path):
+    # (rank_table, flush_table) from a cache file: the fingerprint, entry count, rank table keys, their strengths,
+    # flush table. None when the file is missing, doesn't look right or was written with another strength encoding
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    values = array.array("q")
+    values.frombytes(data[:len(data) - len(data) % values.itemsize])
+    fingerprint = _fingerprint()
+    checks = len(fingerprint)
+    if len(values) <= checks or values[:checks].tolist() != fingerprint:
+        return None
+    values = values[checks:]
+    if len(values) != 1 + 2 * values[0] + (1 << 13):
+        return None
+    size = values[0]
+    rank_table = dict(zip(values[1:1 + size], values[1 + size:1 + 2 * size]))
+    flush_table = values[1 + 2 * size:].tolist()
+    # The stored tables must agree with the fingerprint too
+    stored = [rank_table.get(_prime_product(ranks)) for ranks in CHECK_HANDS] + [flush_table[rankmask] for rankmask in CHECK_FLUSHES]
+    if stored != fingerprint:
+        return None
+    return rank_table, flush_table
+
+
+def _write_cache(path, rank_table, flush_table):
+    # Written next to `path` then renamed over it, like checkpoint.save_counts. A cache that can't be written is skipped
+    values = array.array("q", _fingerprint())
+    values.append(len(rank_table))
+    values.extend(rank_table.keys())
+    values.extend(rank_table.values())
+    values.extend(flush_table)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary, "wb") as f:
+            f.write(values.tobytes())
+        os.replace(temporary, path)
+    except OSError:
+        pass
+
+
+RANK_TABLE = None
+FLUSH_TABLE = None
+
+
+def load_tables():
+    """ Returns (RANK_TABLE, FLUSH_TABLE), reading them from the cache or building (and caching) them on first use """
+    global RANK_TABLE, FLUSH_TABLE
+    if RANK_TABLE is None:
+        path = os.path.join(CACHE_DIR, TABLE_CACHE) if CACHE_DIR else None
+        tables = _read_cache(path) if path else None
+        if tables is None:
+            tables = _build_tables()
+            if path:
+                _write_cache(path, *tables)
+        RANK_TABLE, FLUSH_TABLE = tables
+    return RANK_TABLE, FLUSH_TABLE
+
+
+def evaluate_ids(cardids):
+    """ Returns the integer strength of the best 5 card hand in `cardids` (7 card ids, see card.py) """
+    if RANK_TABLE is None:
+        load_tables()
+    product = 1
+    suitmasks = [0, 0, 0, 0]
+    for cardid in cardids:
+        product *= CARD_PRIMES[cardid]
+        suitmasks[cardid // 13] |= CARD_BITS[cardid]
+
+    # With 7 cards a flush rules out quads and full houses, so the flush table has the best hand
+    for rankmask in suitmasks:
+        if FLUSH_TABLE[rankmask]:
+            return FLUSH_TABLE[rankmask]
+
+    try:
+        return RANK_TABLE[product]
+    except KeyError:
+        # Fewer than 7 cards, or repeated cards: evaluate once and remember the result
+        strength = RANK_TABLE[product] = rank_strength([card_rank(cardid) for cardid in cardids])
+        return strength
+
+
+class BoardState:
+    """ The part of evaluate_ids that is the same for every seat of a round, done once for the community cards:
+        the product of their rank primes (rank histogram, pairs and straights all come out of RANK_TABLE) and,
+        when one suit shows 3 or more times, that suit and its rank mask (no other suit can make a flush).
+        evaluate(card1, card2) then adds a seat's two hole cards with a few multiplications and table lookups """
+    __slots__ = ("cardids", "product", "flush_suit", "flush_mask")
+
+    def __init__(self, cardids):
+        if RANK_TABLE is None:
+            load_tables()
+        self.cardids = list(cardids)
+        self.product = 1
+        suitmasks = [0, 0, 0, 0]
+        for cardid in self.cardids:
+            self.product *= CARD_PRIMES[cardid]
+            suitmasks[cardid // 13] |= CARD_BITS[cardid]
+        self.flush_suit = -1
+        self.flush_mask = 0
+        for suit, rankmask in enumerate(suitmasks):
+            if bin(rankmask).count("1") >= 3:
+                self.flush_suit = suit
+                self.flush_mask = rankmask
+
+    def evaluate(self, card1, card2):
+        """ Strength of the best hand from the board and two hole card ids, same result as evaluate_ids """
+        if self.flush_suit >= 0:
+            rankmask = self.flush_mask
+            if card1 // 13 == self.flush_suit:
+                rankmask |= CARD_BITS[card1]
+            if card2 // 13 == self.flush_suit:
+                rankmask |= CARD_BITS[card2]
+            if FLUSH_TABLE[rankmask]:
+                return FLUSH_TABLE[rankmask]
+
+        product = self.product * CARD_PRIMES[card1] * CARD_PRIMES[card2]
+        try:
+            return RANK_TABLE[product]
+        except KeyError:
+            strength = RANK_TABLE[product] = rank_strength([card_rank(cardid) for cardid in self.cardids + [card1, card2]])
+            return strength
+
+
+def evaluate(cards):
+    """ Returns the integer strength of the best 5 card hand in `cards` (a list of 7 Card objects) """
+    return evaluate_ids([card.id for card in cards])
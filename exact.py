@@ -0,0 +1,64 @@
+""" Exact equity by enumeration. Instead of sampling random rounds, walks every remaining board runout and every
+    opponent hand once, so the result has zero variance. Runouts that are the same up to a relabelling of suits
+    (one that leaves player1's cards and the known board unchanged) are evaluated once and weighted by how many
+    runouts they stand for """
+import itertools
+from math import comb
+import numpy as np
+import evaluator
+from card import permute_suits
+from batchsimulation import evaluate_array
+from results import SimulationCounts
+
+MAX_EVALUATIONS = 20_000_000 # hand evaluations one call may need before it refuses and leaves it to Monte Carlo
+
+
+def suit_symmetries(known):
+    # Suit permutations that map the set of known cards onto itself
+    known = set(known)
+    return [permutation for permutation in itertools.permutations(range(4))
+            if {permute_suits(cardid, permutation) for cardid in known} == known]
+
+
+def canonical_runouts(known, unknown, missing):
+    """ Returns {runout: weight} over every way to deal `missing` board cards from `unknown`, merging runouts
+        that a suit symmetry of the `known` cards maps onto each other """
+    symmetries = suit_symmetries(known)
+    runouts = {}
+    for runout in itertools.combinations(unknown, missing):
+        if len(symmetries) > 1:
+            runout = min(tuple(sorted(permute_suits(cardid, permutation) for cardid in runout)) for permutation in symmetries)
+        runouts[runout] = runouts.get(runout, 0) + 1
+    return runouts
+
+
+def exact_equity(hole_ids, board_ids=(), num_players=2, max_evaluations=MAX_EVALUATIONS, dead_ids=()):
+    """ Exact outcome counts for player1 holding the card ids `hole_ids` with 0-5 known board cards `board_ids`,
+        and `dead_ids` out of play.
+        Returns a SimulationCounts where rounds is the number of (opponent hand, runout) combinations, so
+        win_probability() is the exact equity. Only heads-up (num_players = 2) is enumerated. Raises ValueError
+        when more than max_evaluations hands would have to be evaluated (a pre-flop spot needs about 2 billion) """
+    if num_players != 2:
+        raise ValueError("Exact enumeration is only available heads-up (num_players = 2)")
+    hole_ids = tuple(hole_ids)
+    board_ids = tuple(board_ids)
+    if len(board_ids) > 5:
+        raise ValueError("A board has at most 5 cards")
+    known = hole_ids + board_ids + tuple(dead_ids)
+    unknown = [cardid for cardid in range(52) if cardid not in known]
+    missing = 5 - len(board_ids)
+    evaluations = comb(len(unknown), missing) * comb(len(unknown) - missing, 2)
+    if evaluations > max_evaluations:
+        raise ValueError(f"Exact enumeration needs {evaluations} evaluations, more than max_evaluations={max_evaluations}")
+
+    opponent_hands = np.array(list(itertools.combinations(unknown, 2)), dtype=np.int64)
+    counts = SimulationCounts()
+    for runout, weight in canonical_runouts(known, unknown, missing).items():
+        board = board_ids + runout
+        hero = evaluator.evaluate_ids(hole_ids + board)
+        hands = opponent_hands[~np.isin(opponent_hands, runout).any(axis=1)]
+        opponents = evaluate_array(np.concatenate([hands, np.broadcast_to(np.array(board, dtype=np.int64), (len(hands), 5))], axis=1))
+        wins = int(np.count_nonzero(opponents < hero))
+        ties = int(np.count_nonzero(opponents == hero))
+        counts.add(SimulationCounts(wins * weight, ties * weight, len(hands) * weight))
+    return counts
@@ -0,0 +1,215 @@
+""" Hand ranges and range vs range equity.
+
+    A range is written the usual way, as comma separated parts, each with an optional ":weight" (default 1):
+        AA, QQ+, QQ-99          pairs: one pair, that pair and better, a span of pairs
+        AKs, AKo, AK            suited, offsuit, or both
+        A9s+, KTo+              raise the second card up to one below the first (A9s, ATs, ... AKs)
+        A5s-A2s                 a span of second cards
+        AhKh                    one specific combo
+        15%, top 15%            the best 15% of all 1326 combos, ranked by heads-up equity against a random hand
+    ex: HandRange.parse("QQ+,AKs,AQs:0.5,top 5%")
+
+    Each range is a list of weighted combos with a precomputed card -> combo conflict mask, so a combo that
+    doesn't collide with cards already dealt is drawn in one weighted draw (no rejection loop) """
+import numpy as np
+from card import CARDS, RANK_CHARS, SUIT_CHARS, parse_card
+from canonical import HAND_CLASSES
+from player import Player
+from playpokerround import PlayPokerRound
+from deck import Deck
+from results import SimulationCounts
+import batchsimulation
+import sweep
+
+RANKING_ROUNDS = 4000 # heads-up rounds per hand class when ranking hands for "top x%"
+
+_ranking = None
+
+
+def parse_rank(char):
+    index = RANK_CHARS.find(char.upper())
+    if index < 0:
+        raise ValueError(f"Unknown rank {char!r}")
+    return index + 2
+
+
+def class_combos(low, high, suited):
+    """ Card id pairs of a pre-flop hand class: 6 for a pair, 4 suited, 12 offsuit """
+    combos = []
+    for suit1 in range(4):
+        for suit2 in range(4):
+            if low == high and suit2 <= suit1:
+                continue
+            if low != high and (suit1 == suit2) != suited:
+                continue
+            combos.append((suit1 * 13 + high - 2, suit2 * 13 + low - 2))
+    return combos
+
+
+def hand_ranking():
+    """ The 169 hand classes (low, high, suited) from best to worst by heads-up equity (wins + ties / 2) against a
+        random hand, simulated once with a fixed seed and kept for the rest of the process """
+    global _ranking
+    if _ranking is None:
+        rng = np.random.default_rng(0)
+        equities = {}
+        for key in HAND_CLASSES:
+            counts = batchsimulation.simulate_ids(class_combos(*key)[0], 2, RANKING_ROUNDS, rng)
+            equities[key] = (counts.wins + counts.ties / 2) / counts.rounds
+        _ranking = sorted(equities, key=equities.get, reverse=True)
+    return _ranking
+
+
+def _parse_classes(part):
+    # Hand classes (low, high, suited or None for both) named by one part of a range
+    if "-" in part:
+        first, last = part.split("-")
+        if len(first) == len(last) == 2 and first[0] == first[1] and last[0] == last[1]: # QQ-99
+            ranks = sorted((parse_rank(first[0]), parse_rank(last[0])))
+            return [(rank, rank, False) for rank in range(ranks[0], ranks[1] + 1)]
+        if len(first) < 2 or first[0] != last[0] or first[2:] != last[2:]:
+            raise ValueError(f"Can't read range span {part!r}")
+        high = parse_rank(first[0])
+        lows = sorted((parse_rank(first[1]), parse_rank(last[1])))
+        return [(low, high, _suited(first[2:])) for low in range(lows[0], lows[1] + 1)]
+
+    plus = part.endswith("+")
+    part = part.rstrip("+")
+    if len(part) not in (2, 3):
+        raise ValueError(f"Can't read range part {part!r}")
+    high, low = parse_rank(part[0]), parse_rank(part[1])
+    if high == low:
+        return [(rank, rank, False) for rank in range(high, 15 if plus else high + 1)]
+    high, low = max(high, low), min(high, low)
+    suited = _suited(part[2:])
+    return [(second, high, suited) for second in range(low, high if plus else low + 1)]
+
+
+def _suited(suffix):
+    if suffix == "s":
+        return True
+    elif suffix == "o":
+        return False
+    elif suffix == "":
+        return None
+    raise ValueError(f"Unknown suffix {suffix!r}, expected s or o")
+
+
+class HandRange:
+    """ Weighted set of hole card combos. combos is an (m, 2) array of card ids, weights an (m,) array,
+        and conflicts[cardid] flags the combos that hold that card """
+    def __init__(self, combos, weights=None):
+        self.combos = np.array(combos, dtype=np.int64).reshape(-1, 2)
+        self.weights = np.ones(len(self.combos)) if weights is None else np.array(weights, dtype=float)
+        self.conflicts = np.zeros((52, len(self.combos)), dtype=bool)
+        for column in range(2):
+            self.conflicts[self.combos[:, column], np.arange(len(self.combos))] = True
+
+    @classmethod
+    def parse(cls, text):
+        weights = {} # combo -> weight, a later part overrides an earlier one
+        for part in text.replace(" ", "").split(","):
+            if not part:
+                continue
+            weight = 1.0
+            if ":" in part:
+                part, weight = part.split(":")
+                weight = float(weight)
+            for combo in cls._parse_part(part):
+                weights[tuple(sorted(combo))] = weight
+        combos = [combo for combo, weight in weights.items() if weight > 0]
+        if not combos:
+            raise ValueError(f"Range {text!r} holds no combos")
+        return cls(combos, [weights[combo] for combo in combos])
+
+    @staticmethod
+    def _parse_part(part):
+        if part.lower().startswith("top"):
+            part = part[3:]
+        if part.endswith("%"):
+            target = float(part[:-1]) / 100 * 1326
+            combos = []
+            for key in hand_ranking():
+                if len(combos) >= target:
+                    break
+                combos.extend(class_combos(*key))
+            return combos
+        if len(part) == 4 and part[1] in SUIT_CHARS and part[3] in SUIT_CHARS: # AhKh
+            card1, card2 = parse_card(part[:2]), parse_card(part[2:])
+            if card1 == card2:
+                raise ValueError(f"Combo {part!r} uses the same card twice")
+            return [(card1, card2)]
+        combos = []
+        for low, high, suited in _parse_classes(part):
+            for flag in ([True, False] if suited is None else [suited]):
+                combos.extend(class_combos(low, high, flag))
+        return combos
+
+    def __len__(self):
+        return len(self.combos)
+
+    def sample(self, used, rng):
+        """ Draws one combo, weighted, from those that hold none of the card ids in `used` """
+        available = self.weights * ~self.conflicts[list(used)].any(axis=0) if used else self.weights
+        cumulative = np.cumsum(available)
+        if cumulative[-1] <= 0:
+            raise ValueError("Every combo in the range collides with cards already dealt")
+        index = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))
+        return tuple(self.combos[min(index, len(self.combos) - 1)].tolist())
+
+
+def as_range(hand):
+    # Accepts a HandRange, a range string or a Player
+    if isinstance(hand, HandRange):
+        return hand
+    if isinstance(hand, Player):
+        return HandRange([(hand.card1.id, hand.card2.id)])
+    return HandRange.parse(hand)
+
+
+def unblocked_weight(hero, villain):
+    """ For each combo of `hero`, the summed weight of the `villain` combos that share no card with it """
+    blocked = villain.conflicts[hero.combos[:, 0]] | villain.conflicts[hero.combos[:, 1]]
+    return ~blocked @ villain.weights
+
+
+def range_equity(hero, opponents, n_rounds, num_players=None, rng=None):
+    """ Plays n_rounds rounds of `hero` (a Player, range string or HandRange) against one range per opponent
+        in `opponents`, through PlayPokerRound. Seats past len(opponents) + 1, up to num_players, get random hands.
+        Each round draws hero's combo with probability proportional to its weight times the total weight of the
+        first opponent's combos it doesn't block, then each opponent's in turn from the combos that don't collide
+        with cards already dealt. Heads-up that follows the joint distribution of non-conflicting deals; with more
+        ranges the later opponents are the usual deal-in-order approximation. Returns a SimulationCounts for hero """
+    rng = np.random.default_rng(rng)
+    hero = as_range(hero)
+    opponents = [as_range(opponent) for opponent in opponents]
+    if opponents:
+        hero = HandRange(hero.combos, hero.weights * unblocked_weight(hero, opponents[0]))
+        if not hero.weights.any():
+            raise ValueError("Every hero combo collides with every combo of the first opponent's range")
+    num_players = num_players or len(opponents) + 1
+    if num_players < len(opponents) + 1:
+        raise ValueError(f"{len(opponents)} opponent ranges need at least {len(opponents) + 1} players, got {num_players}")
+    deck = Deck(sweep.python_random(rng)) # deals the random seats and the board
+
+    # The same Player objects and round are refilled every round
+    player1 = Player(None, None)
+    seats = [Player(None, None) for _ in opponents]
+    pokerround = PlayPokerRound(num_players, player1, deck)
+    counts = SimulationCounts(rounds=n_rounds)
+    for _ in range(n_rounds):
+        used = list(hero.sample((), rng))
+        player1.reset(CARDS[used[0]], CARDS[used[1]])
+        for opponent, seat in zip(opponents, seats):
+            card1, card2 = opponent.sample(used, rng)
+            used += [card1, card2]
+            seat.reset(CARDS[card1], CARDS[card2])
+
+        pokerround.deal(seats)
+        pokerround.get_handvalues()
+        outcome, share = pokerround.get_showdown()[0]
+        if outcome == "win":
+            counts.wins += 1
+        elif outcome == "split":
+            counts.ties += 1
+    return counts
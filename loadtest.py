@@ -0,0 +1,98 @@
+""" Load test for server.py: `clients` threads each open a connection and send `queries` equity queries back to
+    back, drawn from a seeded mix of hands, boards and player counts. Reports the p50/p99 latency and queries per
+    second. Without --socket/--port a server is started in this process first.
+
+    python3 loadtest.py --clients 16 --queries 200 --rounds 2000 """
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import numpy as np
+from card import RANK_CHARS, SUIT_CHARS
+from server import EquityClient, EquityServer
+
+CARD_NAMES = [rank + suit for suit in SUIT_CHARS for rank in RANK_CHARS] # indexed by card id
+
+
+def make_queries(count, seed, distinct=50):
+    """ `count` queries picked from `distinct` different ones, so some repeat like they would from real tools """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        cards = rng.sample(CARD_NAMES, 7)
+        board = cards[2:2 + rng.choice([0, 3, 4, 5])]
+        pool.append({"hole": "".join(cards[:2]), "board": "".join(board), "num_players": rng.randint(2, 9)})
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def start_server(batch_seconds):
+    """ Runs an EquityServer on a free localhost port in a background thread, returns (server, address) """
+    server = EquityServer(batch_seconds)
+    ready = threading.Event()
+    address = []
+    def started(listening):
+        address.append(listening)
+        ready.set()
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(port=0, started=started),), daemon=True)
+    thread.start()
+    ready.wait()
+    return server, address[0]
+
+
+def run_load(address, clients, queries, rounds, seed=0):
+    """ Returns (latencies in seconds, wall time) """
+    latencies = []
+    lock = threading.Lock()
+    def client(number):
+        mine = []
+        with EquityClient(address) as connection:
+            for query in make_queries(queries, seed + number):
+                start = time.perf_counter()
+                connection.query(rounds=rounds, **query)
+                mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Measure equity server latency and throughput")
+    parser.add_argument("--socket", help="Unix socket of a running server")
+    parser.add_argument("--port", type=int, help="localhost port of a running server")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--queries", type=int, default=100, help="queries per connection")
+    parser.add_argument("--rounds", type=int, default=2000, help="rounds per query")
+    parser.add_argument("--batch-ms", type=float, default=2.0, help="batching window of the in-process server")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.socket:
+        address = args.socket
+    elif args.port:
+        address = ("127.0.0.1", args.port)
+    else:
+        server, address = start_server(args.batch_ms / 1000)
+
+    latencies, wall = run_load(address, args.clients, args.queries, args.rounds)
+    report = {"clients": args.clients, "queries": len(latencies), "rounds": args.rounds,
+              "qps": len(latencies) / wall,
+              "p50_ms": float(np.percentile(latencies, 50) * 1000),
+              "p99_ms": float(np.percentile(latencies, 99) * 1000)}
+    if server is not None:
+        report.update(batches=server.batches, simulations=server.simulations, cache_hits=server.cache.hits)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,35 +1,270 @@
-import pandas as pd
-from playpokerround import PlayPokerRound
+import argparse
+import filecmp
+import os
+import sys
+import time
 from deck import Deck
-import testcase
+from canonical import hand_class
+import sweepoptions
+import resultwriter
 
-def main():
-    """ Creates a pandas dataframe of the 169 hole card win percentages varying by number of players (2-10).
-       Calculates percentages by playing a full round of poker num_simulation times and counting how many times
-       the holecards won the round. (all players play all the way through, no betting or folding) """
+# NumPy (sweep, profiling), pandas, checkpoints and range parsing are imported by the functions that use them,
+# so the command line starts (and answers --help) without loading them
+
+OUTPUT = "poker_win_percentages.xlsx"
+OUTPUT_FORMATS = {".xlsx": "xlsx", ".peq": "table", **resultwriter.FORMATS}
+
+
+class Progress:
+    """ Live progress line on stderr: cells done, rounds played, rounds per second and estimated time left.
+        Call it with the SimulationCounts of every finished cell and the rounds dealt for it, when that isn't
+        counts.rounds (cells sharing their deals, see sweep.iter_sweep). The line is redrawn at most every `interval` seconds """
+    def __init__(self, total_cells, stream=None, interval=1.0):
+        self.total_cells = total_cells
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.cells = 0
+        self.rounds = 0
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.finished = False
+
+    def __call__(self, counts, rounds=None):
+        self.cells += 1
+        self.rounds += counts.rounds if rounds is None else rounds
+        now = time.monotonic()
+        if self.cells == self.total_cells:
+            self.finish()
+        elif now - self.last_report >= self.interval:
+            self.last_report = now
+            self.stream.write("\r" + self.get_status(now))
+            self.stream.flush()
+
+    def get_status(self, now=None):
+        elapsed = (now or time.monotonic()) - self.start
+        rate = self.rounds / elapsed if elapsed > 0 else 0.0
+        if self.cells:
+            eta = f"{elapsed * (self.total_cells - self.cells) / self.cells:,.0f}s"
+        else:
+            eta = "?"
+        return f"{self.cells}/{self.total_cells} cells  {self.rounds:,} rounds  {rate:,.0f} rounds/s  ETA {eta}  "
+
+    def finish(self):
+        # Ends the line. Called on the last cell, and by the caller for runs that stop short (ex: a resumed checkpoint)
+        if self.finished:
+            return
+        self.finished = True
+        self.stream.write("\r" + self.get_status() + "\n")
+        self.stream.flush()
+
+
+def parse_player_counts(text):
+    """ "2-10" or "2,3,6" (or a mix, "2-4,9") -> sorted list of player counts """
+    counts = set()
+    for part in text.replace(" ", "").split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            counts.update(range(int(first), int(last) + 1))
+        elif part:
+            counts.add(int(part))
+    if not counts or min(counts) < 2 or max(counts) > 10:
+        raise ValueError(f"Player counts {text!r} must be between 2 and 10")
+    return sorted(counts)
+
+
+def select_hands(holecards, text):
+    """ The Players in holecards whose hand class is in the range `text` (see handrange.py, ex: "QQ+,AKs") """
+    from handrange import HandRange
+    classes = {hand_class(combo) for combo in HandRange.parse(text).combos.tolist()}
+    return [cards for cards in holecards if hand_class((cards.card1.id, cards.card2.id)) in classes]
 
+
+def get_holecards(hands=None):
     deck = Deck()
     deck.get_uniqueholecards()
-    num_simulations = 5000
+    if hands is None:
+        return deck.uniqueholecards
+    return select_hands(deck.uniqueholecards, hands)
+
+
+def main(num_simulations=5000, engine="object", seed=None, workers=1, chunksize=1, target_halfwidth=None, batch_size=sweepoptions.BATCH_SIZE,
+         checkpoint_path=None, add_samples=False, player_counts=sweepoptions.PLAYER_COUNTS, hands=None, progress=None, nested=False):
+    """ Creates a pandas dataframe of the 169 hole card win percentages varying by number of players (2-10).
+       Calculates percentages by playing a full round of poker num_simulation times and counting how many times
+       the holecards won the round. (all players play all the way through, no betting or folding)
+       engine = "object" plays PlayPokerRound one round at a time, "vectorized" deals blocks of rounds
+       at once with batchsimulation, "stratified" is the vectorized engine with stratified flops and control
+       variates (see stratified.py), whose cells report their effective rounds, and "all-seats" fills every hand
+       class from each round's seats at once (see sweep.run_sweep). workers > 1 (or None for one per core) splits
+       the (holecards, num_players) cells across a process pool, `chunksize` cells per task. A `seed` makes the
+       table reproducible.
+       Adaptive mode: with a target_halfwidth (ex: 0.005 for +/- 0.5%) each cell plays batch_size rounds at a time
+       until its 95% Wilson interval is that narrow, up to num_simulations rounds, and the sample count and
+       interval are added next to each win %.
+       With a checkpoint_path the raw counts are saved there as the run goes, and a rerun resumes from them
+       (add_samples=True adds num_simulations more rounds per cell to the saved counts instead).
+       player_counts and hands (a range string, ex: "QQ+,AKs") restrict the table to some columns and rows.
+       nested=True fills every column from one set of deals with the most players (see sweep.run_sweep).
+       progress(counts, rounds) is called with the SimulationCounts of each cell as it finishes (see Progress).
+       When profiling.enable() was called first, the per-stage timings are printed at the end """
+    import sweep
+    import profiling
+
+    holecards = get_holecards(hands)
 
-    wins_df = pd.DataFrame.from_dict({"Hole Cards": deck.uniqueholecards})
-    for num_players in range (2,11):
-        win_count = {key: 0 for key in deck.uniqueholecards}
-        for holecards in deck.uniqueholecards:
-            for _ in range(num_simulations):
-                pokerround = PlayPokerRound(num_players, holecards)
-                pokerround.deal() # Deal two cards to each player and five cards to the board
-                pokerround.get_handvalues() # Determine the value of each hand (9 = straight flush, 1 = High card)
-                if pokerround.get_winner(): # Return true if the player with "holecards" had the best hand
-                    win_count[holecards] += 1
+    if checkpoint_path is not None:
+        import checkpoint
+        if nested:
+            raise ValueError("Checkpointed runs simulate each player count separately, nested=True isn't supported")
+        saved = checkpoint.run_checkpointed(checkpoint_path, holecards, num_simulations, engine, seed, workers,
+                                            chunksize, player_counts, add=add_samples, progress=progress,
+                                            target_halfwidth=target_halfwidth, batch_size=batch_size)
+        counts = {(num_players, index): saved[num_players, hand_class((cards.card1.id, cards.card2.id))]
+                  for num_players in player_counts for index, cards in enumerate(holecards)}
+    else:
+        counts = {}
+        for key, cell in sweep.iter_sweep(holecards, num_simulations, engine, seed, workers, chunksize, player_counts,
+                                          target_halfwidth, batch_size, nested, progress):
+            counts[key] = cell
 
-        win_probability = {key: value / num_simulations for key, value in win_count.items()}
+    import pandas as pd
+    wins_df = pd.DataFrame.from_dict({"Hole Cards": holecards})
+    for num_players in player_counts:
+        cells = {key: counts[num_players, index] for index, key in enumerate(holecards)}
+        win_probability = {key: cell.win_probability() for key, cell in cells.items()}
 
         wins_df["Win % for " + str(num_players) + " players"] = wins_df["Hole Cards"].map(win_probability)
+        if target_halfwidth is not None:
+            intervals = {key: cell.wilson_interval() for key, cell in cells.items()}
+            wins_df["Samples for " + str(num_players) + " players"] = wins_df["Hole Cards"].map({key: cell.rounds for key, cell in cells.items()})
+            wins_df["CI low for " + str(num_players) + " players"] = wins_df["Hole Cards"].map({key: low for key, (low, high) in intervals.items()})
+            wins_df["CI high for " + str(num_players) + " players"] = wins_df["Hole Cards"].map({key: high for key, (low, high) in intervals.items()})
     print("done")
+    if profiling.is_enabled():
+        print(profiling.report())
     return wins_df
 
+def stream(path, num_simulations=5000, engine="vectorized", seed=None, workers=1, chunksize=1, target_halfwidth=None,
+           batch_size=sweepoptions.BATCH_SIZE, format=None, player_counts=sweepoptions.PLAYER_COUNTS, hands=None, progress=None, nested=False):
+    """ Runs the same sweep as main(), but writes each (hole cards, num_players) cell to `path` as soon as it is done
+        (one row per cell: hand label, counts and 95% interval) instead of building a DataFrame.
+        format = "csv", "parquet" or "arrow", by default from the file extension. Returns the number of rows written """
+    import sweep
+    holecards = get_holecards(hands)
+    cells = sweep.iter_sweep(holecards, num_simulations, engine, seed, workers, chunksize, player_counts,
+                             target_halfwidth, batch_size, nested, progress)
+    with resultwriter.open_writer(path, format) as writer:
+        for (num_players, index), counts in cells:
+            writer.write(resultwriter.make_row(holecards[index], num_players, counts))
+    return writer.rows_written
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Simulate pre-flop win percentages of hole cards against 1-9 opponents")
+    parser.add_argument("-n", "--simulations", type=int, default=5000,
+                        help="rounds per cell, or the most rounds per cell with --target-halfwidth (default 5000)")
+    parser.add_argument("-p", "--players", type=parse_player_counts, default=list(sweepoptions.PLAYER_COUNTS),
+                        help='player counts, ex: "2-10" (default), "6" or "2,3,6"')
+    parser.add_argument("--hands", help='only these hands, as a range, ex: "QQ+,AKs,A5s-A2s" (default: all 169)')
+    parser.add_argument("-e", "--engine", choices=sweepoptions.ENGINES, default="vectorized",
+                        help="play rounds one at a time, in NumPy blocks (default, much faster), or in NumPy blocks "
+                             "stratified by flop texture with control variates (narrower intervals per round), or "
+                             "all-seats: every seat of a round counts for its hand (num_players times fewer rounds "
+                             "for the full 169 hand table, can't be combined with --hands)")
+    parser.add_argument("-s", "--seed", type=int, help="seed for a reproducible table")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes, 0 = one per core (default 1)")
+    parser.add_argument("--chunksize", type=int, default=1, help="cells handed to a worker at a time")
+    parser.add_argument("--target-halfwidth", type=float,
+                        help="stop each cell once its 95%% interval is this narrow, ex: 0.005")
+    parser.add_argument("--batch-size", type=int, default=sweepoptions.BATCH_SIZE, help="rounds between interval checks")
+    parser.add_argument("--nested", action="store_true",
+                        help="fill every player count from the same deals with the most players (fewer rounds, smoother columns)")
+    parser.add_argument("-o", "--output", default=OUTPUT, help=f"output file (default {OUTPUT})")
+    parser.add_argument("-f", "--format", choices=sorted(set(OUTPUT_FORMATS.values())),
+                        help="output format (default: from the output file extension)")
+    parser.add_argument("--checkpoint", help="save raw counts here as the run goes and resume from them (.xlsx output)")
+    parser.add_argument("--add-samples", action="store_true", help="add --simulations more rounds to the checkpoint")
+    parser.add_argument("--expect", metavar="REFERENCE",
+                        help="with --seed, check the output is byte for byte the same as this earlier output")
+    parser.add_argument("--timings", action="store_true", help="time each stage of the round pipeline and report it")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="run under a profiler and print the profile")
+    parser.add_argument("--profile-output", help="also save the raw cProfile stats to this file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress line")
+    return parser
+
+def run(args, format, holecards):
+    # Runs the sweep the command line asked for and writes it out
+    import sweep
+    import profiling
+    progress = None if args.quiet else Progress(len(holecards) * len(args.players))
+    workers = args.workers or None
+    options = dict(engine=args.engine, seed=args.seed, workers=workers, chunksize=args.chunksize,
+                   target_halfwidth=args.target_halfwidth, batch_size=args.batch_size,
+                   player_counts=args.players, hands=args.hands, progress=progress, nested=args.nested)
+    if format == "xlsx":
+        df = main(args.simulations, checkpoint_path=args.checkpoint, add_samples=args.add_samples, **options)
+        df.to_excel(args.output)
+    elif format == "table":
+        counts = {}
+        for (num_players, index), cell in sweep.iter_sweep(holecards, args.simulations, args.engine, args.seed, workers,
+                                                           args.chunksize, args.players, args.target_halfwidth, args.batch_size,
+                                                           args.nested, progress):
+            counts[num_players, hand_class((holecards[index].card1.id, holecards[index].card2.id))] = cell
+        from equitytable import write_table
+        write_table(args.output, counts)
+    else:
+        stream(args.output, args.simulations, format=format, **options)
+    if progress is not None:
+        progress.finish()
+    if profiling.is_enabled() and format != "xlsx": # main() prints its own report
+        print(profiling.report())
+
+def main_cli(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    format = args.format or OUTPUT_FORMATS.get(os.path.splitext(args.output)[1].lower())
+    if format is None:
+        parser.error(f"can't tell the format of {args.output!r}, use --format")
+    if args.checkpoint is not None and format != "xlsx":
+        parser.error("--checkpoint only works with .xlsx output")
+    if args.checkpoint is not None and args.nested:
+        parser.error("--checkpoint and --nested can't be used together")
+    try:
+        sweepoptions.check_engine(args.engine, args.nested, args.target_halfwidth)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.checkpoint is not None and args.engine == "all-seats":
+        parser.error("--checkpoint and --engine all-seats can't be used together")
+    if args.hands is not None and args.engine == "all-seats":
+        # Every hand class is dealt whichever are kept, a subset would cost as much as the full table
+        parser.error("--engine all-seats always simulates all 169 hands, leave out --hands or use another engine")
+    if args.expect is not None and (args.seed is None or format == "xlsx"):
+        # Excel files store the time they were written, so only the other formats can be compared byte for byte
+        parser.error("--expect needs --seed and a .csv, .parquet, .arrow or .peq output")
+    try:
+        holecards = get_holecards(args.hands)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if (args.timings or args.profile) and args.workers != 1:
+        parser.error("--timings and --profile only see this process, use them with --workers 1")
+
+    import profiling
+    if args.timings:
+        profiling.enable()
+    try:
+        if args.profile:
+            profiling.profile(run, args, format, holecards, profiler=args.profile, output=args.profile_output)
+        else:
+            run(args, format, holecards)
+    finally:
+        profiling.disable()
+    if args.expect is not None:
+        if not filecmp.cmp(args.output, args.expect, shallow=False):
+            print(f"{args.output} differs from {args.expect}", file=sys.stderr)
+            return 1
+        print(f"{args.output} matches {args.expect}", file=sys.stderr)
+    return 0
+
 if __name__ == "__main__":
     # testcase.unittest.main()
-    df = main()
-    df.to_excel("poker_win_percentages.xlsx")
+    sys.exit(main_cli())
@@ -1,60 +1,81 @@
-import random
-from deck import Deck 
+from card import CARDS
+from deck import Deck
 from player import Player
+from evaluator import BoardState
 
 class PlayPokerRound:
     """ Plays a poker round to deal two cards from deck to "num_players" and five cards to the "communitycards", 
-        and checks if player1 wins """
-    def __init__(self, num_players, player1):
+        and checks if player1 wins. Pass in a `deck` to reuse one card buffer across rounds.
+        `board` holds community cards that are already known (0-5 Card objects) and `dead` cards that can't be
+        dealt (ex: mucked or seen cards); only the missing community cards are dealt.
+        Without a `deck`, a new one draws from `rng` (a random.Random, default: the random module) """
+    def __init__(self, num_players, player1, deck=None, board=(), dead=(), rng=None):
         self.num_players = num_players
         self.player1 = player1
         self.players = []
-        self.communitycards = []
+        self.board = list(board)
+        self.communitycards = list(board)
+        self.dead = list(dead)
+        self.deck = deck
+        self.rng = rng
+        self.seats = [Player(None, None) for _ in range(num_players - 1)] # reused for the random seats of every deal
+
+    def reset(self, player1=None):
+        # Clears the last round (seats and dealt community cards) so the same object plays the next one,
+        # optionally for a different player1. deal() calls it, so rounds can be played in a loop on one object
+        if player1 is not None:
+            self.player1 = player1
+        self.players.clear()
+        del self.communitycards[len(self.board):]
 
     def deal_communitycard(self, card):
         self.communitycards.append(card)
 
-    def deal(self):
+    def deal(self, opponents=()):
         # Deal two cards to each player then deal 5 cards to communitycards
-        # Remove dealt cards from deck
+        # Dealt cards leave the deck, so no card can be dealt twice
         # Add each player to list "self.players"
-        deck = Deck()
-        self.players.append(self.player1)
-        card1, card2 = self.player1.get_cards()
-        deck.remove(card1)
-        deck.remove(card2)
-
-        for player in range(1, self.num_players):
-            card1 = random.choice(deck.deck)
-            deck.remove(card1)
-            card2 = random.choice(deck.deck)
-            deck.remove(card2)
-            self.players.append(Player(card1, card2))
-
-        # Deal flop
-        burn1 = random.choice(deck.deck)
-        deck.remove(burn1)
-
-        for _ in range(3):
-            flop = random.choice(deck.deck)
-            self.deal_communitycard(flop) # Add card to board
-            deck.remove(flop)
+        # `opponents` are Players whose hole cards were already chosen (ex: sampled from a hand range),
+        # they take the first seats after player1 and the remaining seats are dealt at random
+        # into the preallocated self.seats, which the next deal() overwrites
+        if len(opponents) > self.num_players - 1:
+            raise ValueError(f"{len(opponents)} opponents don't fit at a table of {self.num_players} players")
+        if self.deck is None:
+            self.deck = Deck(self.rng)
+        deck = self.deck
+        deck.reset()
+        self.reset()
+        players = self.players
+        players.append(self.player1)
+        deck.remove(self.player1.card1)
+        deck.remove(self.player1.card2)
+        for player in opponents:
+            deck.remove(player.card1)
+            deck.remove(player.card2)
+            players.append(player)
+        for card in self.communitycards:
+            deck.remove(card)
+        for card in self.dead:
+            deck.remove(card)
 
-        # Deal river and turn
-        for _ in range(2):
-            burncard = random.choice(deck.deck)
-            deck.remove(burncard)
-
-            turn_river = random.choice(deck.deck)
-            self.deal_communitycard(turn_river)
-            deck.remove(turn_river)
+        # Every card the round still needs comes from one bulk draw: two per random seat, then the rest of the
+        # flop, turn and river. Burn cards don't change the odds, so none are dealt
+        seats = self.num_players - 1 - len(opponents)
+        cardids = deck.deal_ids(2 * seats + 5 - len(self.communitycards))
+        for seat in range(seats):
+            player = self.seats[seat]
+            player.reset(CARDS[cardids[2 * seat]], CARDS[cardids[2 * seat + 1]])
+            players.append(player)
+        for cardid in cardids[2 * seats:]:
+            self.deal_communitycard(CARDS[cardid]) # Add card to board
 
     def get_handvalues(self):
-        # Determine the best 5 card hand and ranking of each player
-        # updates (int) player.handrank and (list) player.hand
+        # Determine the strength of each player's best 5 card hand with the lookup-table evaluator
+        # updates (int) player.strength, which player.handrank and player.hand are read from
+        # The board is read once into a BoardState, then each player only adds its two hole cards
+        board = BoardState([card.id for card in self.communitycards])
         for player in self.players:
-            player.get_sevencards(self.communitycards) # list of 5 community cards + player's 2 hole cards
-            player.get_best_poker_hand()
+            player.strength = board.evaluate(player.card1.id, player.card2.id)
 
             """ debugging:
             player.card1.print_card()
@@ -66,28 +87,28 @@ class PlayPokerRound:
             print("\n") """
 
     def get_winner(self):
-        """ Determines if player1 won the round. First checks if player1 has the highest rank,
-        and if so the compares hands for top pair/high cards/kickers if one or more oppoents have the same rank.
+        """ Determines if player1 won the round. Hand strengths are single integers, so player1 wins
+        when its strength is higher than every opponent's strength.
         Returns True if player1 wins, or False if player1 lost or tied """
-        self.players.sort(key=lambda x: x.handrank, reverse=True) # sort players by hand value
- 
-        if self.player1.handrank < self.players[0].handrank:
-            return False
-
-        # Check if opponents have the same type of hand
-        player1_rank = self.player1.handrank
-        player1_hand = self.player1.hand
-        self.players.remove(self.player1)
+        best_opponent = max(player.strength for player in self.players if player is not self.player1)
+        return self.player1.strength > best_opponent
 
-        for opponent in self.players:
-            if player1_rank > opponent.handrank:
-                continue
-            else:
-                cmp_val = opponent.compare_hands(player1_hand, opponent.hand)
+    def get_showdown(self):
+        """ Settles the round for every seat in one pass over the hand strengths. Returns one (outcome, pot share)
+        per player in self.players order (player1 first): ("win", 1.0), ("split", 1 / number of best hands)
+        or ("loss", 0.0) """
+        best = max(player.strength for player in self.players)
+        winners = sum(1 for player in self.players if player.strength == best)
+        if winners == 1:
+            won = ("win", 1.0)
+        else:
+            won = ("split", 1 / winners)
+        return [won if player.strength == best else ("loss", 0.0) for player in self.players]
 
-            if opponent.handrank == player1_rank and cmp_val == 0:
-                return False # Tie
-            elif opponent.handrank == player1_rank and cmp_val == -1:
-                return False # Player1 lost
-
-        return True
\ No newline at end of file
+    def get_exact_equity(self):
+        """ Exact alternative to dealing many random rounds: enumerates every opponent hand and every way to
+        finish the board from the community cards dealt so far. Heads-up only, see exact.exact_equity.
+        Returns a SimulationCounts for player1 """
+        from exact import exact_equity # needs numpy, which the rest of the round doesn't
+        card1, card2 = self.player1.get_cards()
+        return exact_equity((card1.id, card2.id), [card.id for card in self.communitycards], self.num_players)
\ No newline at end of file
@@ -0,0 +1,113 @@
+""" Opt-in instrumentation of the round pipeline. enable() wraps the stage methods below (dealing, hand values,
+    settling the round, the deck and the vectorized evaluator) with timers that count calls and add up seconds,
+    and disable() puts the plain methods back, so nothing is timed or slowed down until it is switched on.
+    Timings are inclusive: a Deck.remove made inside PlayPokerRound.deal counts towards both stages.
+
+    profiling.enable()
+    main.main(200, seed=1)       # prints the report after "done"
+    profiling.disable()
+
+    profile(function, *args) runs one call under cProfile (or pyinstrument) and prints where the time went """
+import cProfile
+import io
+import pstats
+import sys
+import time
+from deck import Deck
+from playpokerround import PlayPokerRound
+import batchsimulation
+
+# (owner, attribute) of every instrumented stage, reported as "Owner.attribute"
+STAGES = [(Deck, "__init__"), (Deck, "remove"), (Deck, "deal_ids"),
+          (PlayPokerRound, "deal"), (PlayPokerRound, "get_handvalues"), (PlayPokerRound, "get_winner"),
+          (PlayPokerRound, "get_showdown"), (batchsimulation, "simulate_ids"), (batchsimulation, "evaluate_array")]
+PROFILE_LINES = 25 # functions listed by the cProfile report
+
+_originals = {} # stage name -> (owner, attribute, unwrapped function) while enabled
+calls = {}
+seconds = {}
+
+
+def stage_name(owner, attribute):
+    return f"{owner.__name__.rsplit('.', 1)[-1]}.{attribute}"
+
+
+def _timed(name, function):
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds[name] += time.perf_counter() - start
+            calls[name] += 1
+    timed.__wrapped__ = function
+    return timed
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable():
+    """ Starts counting every stage. Counts are only kept in this process, so time a run with workers=1 """
+    if is_enabled():
+        return
+    for owner, attribute in STAGES:
+        name = stage_name(owner, attribute)
+        function = getattr(owner, attribute)
+        _originals[name] = (owner, attribute, function)
+        calls.setdefault(name, 0)
+        seconds.setdefault(name, 0.0)
+        setattr(owner, attribute, _timed(name, function))
+
+
+def disable():
+    for owner, attribute, function in _originals.values():
+        setattr(owner, attribute, function)
+    _originals.clear()
+
+
+def reset():
+    for name in calls:
+        calls[name] = 0
+        seconds[name] = 0.0
+
+
+def get_timings():
+    """ {stage name: (calls, total seconds)} for the stages that were called """
+    return {name: (calls[name], seconds[name]) for name in calls if calls[name]}
+
+
+def report():
+    """ The timings as a table, slowest stage first """
+    lines = [f"{'stage':30} {'calls':>12} {'total s':>10} {'us/call':>10}"]
+    for name, (count, total) in sorted(get_timings().items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:30} {count:12,} {total:10.3f} {total / count * 1e6:10.2f}")
+    return "\n".join(lines)
+
+
+def profile(function, *args, profiler="cprofile", output=None, stream=None, **kwargs):
+    """ Calls function(*args, **kwargs) under cProfile or pyinstrument (pip install pyinstrument), prints the profile
+        to `stream` (default stderr) and returns what the function returned. With cProfile, `output` also saves
+        the raw stats there for snakeviz or pstats """
+    stream = stream or sys.stderr
+    if profiler == "pyinstrument":
+        try:
+            import pyinstrument
+        except ImportError:
+            raise ImportError("The pyinstrument profiler needs pyinstrument: pip install pyinstrument") from None
+        with pyinstrument.Profiler() as profiler:
+            result = function(*args, **kwargs)
+        stream.write(profiler.output_text())
+        return result
+    if profiler != "cprofile":
+        raise ValueError(f"Unknown profiler {profiler!r}, expected 'cprofile' or 'pyinstrument'")
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    if output is not None:
+        profiler.dump_stats(output)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    stream.write(text.getvalue())
+    return result
@@ -0,0 +1,90 @@
+from math import sqrt
+
+
+def wilson(successes, n, z=1.96):
+    """ Wilson score interval (low, high) of a proportion, successes out of n """
+    if not n:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    halfwidth = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return center - halfwidth, center + halfwidth
+
+
+class SimulationCounts:
+    """ Raw outcome counts for one (hole cards, num_players) cell: how many rounds were played,
+        how many player1 won outright and how many it split with the best opponent.
+        Counts from separate runs can be merged with add() """
+    def __init__(self, wins=0, ties=0, rounds=0):
+        self.wins = wins
+        self.ties = ties
+        self.rounds = rounds
+
+    @property
+    def losses(self):
+        return self.rounds - self.wins - self.ties
+
+    def add(self, other):
+        self.wins += other.wins
+        self.ties += other.ties
+        self.rounds += other.rounds
+        return self
+
+    def win_probability(self):
+        return self.wins / self.rounds if self.rounds else 0.0
+
+    def tie_probability(self):
+        return self.ties / self.rounds if self.rounds else 0.0
+
+    def wilson_interval(self, z=1.96):
+        """ Wilson score interval (low, high) for the win probability, 95% confidence by default """
+        return wilson(self.wins, self.rounds, z)
+
+    def halfwidth(self, z=1.96):
+        low, high = self.wilson_interval(z)
+        return (high - low) / 2
+
+    def __eq__(self, other):
+        return (self.wins, self.ties, self.rounds) == (other.wins, other.ties, other.rounds)
+
+    def __repr__(self):
+        return f"SimulationCounts(wins={self.wins}, ties={self.ties}, rounds={self.rounds})"
+
+
+class StratifiedCounts(SimulationCounts):
+    """ Result of a variance-reduced estimator (see stratified.py). wins and ties are the estimated probabilities times
+        rounds, rounded to whole rounds so the counts fit every writer and table, and win_variance is the variance of the win probability
+        estimate. effective_rounds is how many plain independent rounds would give the same variance """
+    def __init__(self, wins=0, ties=0, rounds=0, win_variance=0.0):
+        super().__init__(wins, ties, rounds)
+        self.win_variance = win_variance
+
+    @property
+    def effective_rounds(self):
+        p = self.win_probability()
+        if self.win_variance <= 0:
+            return float(self.rounds)
+        return max(p * (1 - p) / self.win_variance, 1.0)
+
+    def gain(self):
+        # Effective rounds per simulated round
+        return self.effective_rounds / self.rounds if self.rounds else 1.0
+
+    def add(self, other):
+        # Pools two independent estimates, weighted by their rounds
+        rounds = self.rounds + other.rounds
+        if rounds:
+            other_variance = getattr(other, "win_variance", other.win_probability() * (1 - other.win_probability()) / max(other.rounds, 1))
+            self.win_variance = (self.rounds ** 2 * self.win_variance + other.rounds ** 2 * other_variance) / rounds ** 2
+        super().add(other)
+        return self
+
+    def wilson_interval(self, z=1.96):
+        """ Wilson interval computed as if the estimate came from effective_rounds plain rounds """
+        effective = self.effective_rounds
+        return wilson(self.win_probability() * effective, effective, z) if self.rounds else (0.0, 1.0)
+
+    def __repr__(self):
+        return (f"StratifiedCounts(wins={self.wins}, ties={self.ties}, rounds={self.rounds}, "
+                f"effective_rounds={self.effective_rounds:.0f})")
@@ -0,0 +1,137 @@
+""" Streaming result writers. Each finished (hand, num_players) cell becomes one row with a string hand label, its
+    counts and its confidence interval, and rows are written out in chunks as the sweep goes instead of building
+    the whole table in memory first.
+
+    CSV needs nothing extra, Parquet and Arrow (IPC file) need pyarrow:  pip install pyarrow
+
+    with open_writer("results.parquet") as writer:
+        for (num_players, index), counts in sweep.iter_sweep(holecards, 5000):
+            writer.write(make_row(holecards[index], num_players, counts)) """
+import csv
+import os
+from canonical import hand_label
+
+COLUMNS = ["hand", "num_players", "rounds", "wins", "ties", "win_probability", "ci_low", "ci_high"]
+CHUNK_ROWS = 1000 # rows buffered before they are written out
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+def make_row(holecards, num_players, counts):
+    """ One output row for a Player's hole cards and the SimulationCounts of its cell """
+    low, high = counts.wilson_interval()
+    return {"hand": hand_label((holecards.card1.id, holecards.card2.id)), "num_players": num_players,
+            "rounds": counts.rounds, "wins": counts.wins, "ties": counts.ties,
+            "win_probability": counts.win_probability(), "ci_low": low, "ci_high": high}
+
+
+class ResultWriter:
+    """ Buffers rows and hands them to write_chunk() CHUNK_ROWS at a time. Use as a context manager,
+        or call close() to write the last chunk """
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = []
+        self.rows_written = 0
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.write_chunk(self.rows)
+            self.rows_written += len(self.rows)
+            self.rows = []
+
+    def write_chunk(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVWriter(ResultWriter):
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, chunk_rows)
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write_chunk(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def _schema(pyarrow):
+    return pyarrow.schema([("hand", pyarrow.string()), ("num_players", pyarrow.int32()), ("rounds", pyarrow.int64()),
+                           ("wins", pyarrow.int64()), ("ties", pyarrow.int64()), ("win_probability", pyarrow.float64()),
+                           ("ci_low", pyarrow.float64()), ("ci_high", pyarrow.float64())])
+
+
+class ParquetWriter(ResultWriter):
+    # Every chunk is one Parquet row group
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, chunk_rows)
+        self.pyarrow = _import_pyarrow()
+        import pyarrow.parquet
+        self.schema = _schema(self.pyarrow)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_chunk(self, rows):
+        self.writer.write_table(self.pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+class ArrowWriter(ResultWriter):
+    # Arrow IPC file (readable with pyarrow.ipc.open_file or pandas.read_feather), one record batch per chunk
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, chunk_rows)
+        self.pyarrow = _import_pyarrow()
+        import pyarrow.ipc
+        self.schema = _schema(self.pyarrow)
+        self.sink = self.pyarrow.OSFile(path, "wb")
+        self.writer = pyarrow.ipc.new_file(self.sink, self.schema)
+
+    def write_chunk(self, rows):
+        self.writer.write_batch(self.pyarrow.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+        self.sink.close()
+
+
+WRITERS = {"csv": CSVWriter, "parquet": ParquetWriter, "arrow": ArrowWriter}
+
+
+def open_writer(path, format=None, chunk_rows=CHUNK_ROWS):
+    """ Opens a writer for `path`, format "csv", "parquet" or "arrow" (default: from the file extension) """
+    if format is None:
+        format = FORMATS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise ValueError(f"Can't tell the output format of {path!r}, expected one of {', '.join(FORMATS)}")
+    if format not in WRITERS:
+        raise ValueError(f"Unknown output format {format!r}, expected one of {', '.join(WRITERS)}")
+    return WRITERS[format](path, chunk_rows)
@@ -0,0 +1,248 @@
+""" Long-running local equity service. Keeps the evaluator tables loaded and answers equity queries over a Unix
+    socket or localhost TCP, one JSON object per line each way:
+
+    python3 server.py --socket /tmp/poker.sock          (or --port 8765)
+
+    request:  {"hole": "AhKh", "board": "Qh Jh 2c", "dead": "", "num_players": 3, "rounds": 10000}
+    response: {"wins": ..., "ties": ..., "losses": ..., "rounds": ..., "win_probability": ..., "win_interval": [low, high],
+               "tie_probability": ..., "tie_interval": [...], "loss_probability": ..., "loss_interval": [...]}
+              or {"error": "..."}
+
+    Requests that arrive within BATCH_SECONDS of each other are answered together on a worker thread: queries that
+    are the same up to suit relabelling (see canonical.py) are simulated once for all of them, answers without dead
+    cards are kept in an EquityCache, and the remaining distinct queries are stacked into shared NumPy blocks, one
+    vectorized pass per (num_players, known board cards) in the batch.
+    EquityClient is a small blocking client, loadtest.py measures latency and throughput """
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import numpy as np
+import batchsimulation
+from canonical import canonical_key
+from equity import check_cards
+from equitycache import EquityCache
+from results import SimulationCounts, wilson
+
+BATCH_SECONDS = 0.002 # how long the first request of a batch waits for others
+MAX_BATCH = 256 # requests per batch
+ROUNDS = 10000 # rounds per query unless the request asks for another number
+MAX_ROUNDS = 1000000
+
+
+def parse_query(request):
+    """ (hole ids, board ids, dead ids, num_players, rounds) of a request dict, ValueError when it is invalid """
+    num_players = int(request.get("num_players", 2))
+    rounds = int(request.get("rounds", ROUNDS))
+    if not 2 <= num_players <= 10:
+        raise ValueError(f"num_players must be 2-10, got {num_players}")
+    if not 0 < rounds <= MAX_ROUNDS:
+        raise ValueError(f"rounds must be 1-{MAX_ROUNDS}, got {rounds}")
+    hole, board, dead = check_cards(request.get("hole", ""), request.get("board", ()), request.get("dead", ()), num_players)
+    return tuple(hole), tuple(board), tuple(dead), num_players, rounds
+
+
+def format_counts(counts):
+    """ Response dict of a SimulationCounts: the counts, and each outcome's probability and 95% Wilson interval """
+    response = {"wins": counts.wins, "ties": counts.ties, "losses": counts.losses, "rounds": counts.rounds}
+    for outcome, count in (("win", counts.wins), ("tie", counts.ties), ("loss", counts.losses)):
+        response[outcome + "_probability"] = count / counts.rounds
+        response[outcome + "_interval"] = list(wilson(count, counts.rounds))
+    return response
+
+
+class EquityServer:
+    """ Answers queries in batches. submit(request) is awaited by the connection handlers, a single batching task
+        collects what was submitted and hands each batch to answer_batch() on a worker thread """
+    def __init__(self, batch_seconds=BATCH_SECONDS, max_batch=MAX_BATCH, cache_size=4096, rng=None):
+        self.batch_seconds = batch_seconds
+        self.max_batch = max_batch
+        self.rng = np.random.default_rng(rng)
+        self.cache = EquityCache(cache_size, rng=self.rng)
+        self.queue = None
+        self.batches = 0
+        self.requests = 0
+        self.simulations = 0 # distinct queries simulated, after coalescing and the cache
+        self.passes = 0 # simulate_stacked calls, one per (num_players, known board cards) in a batch
+        batchsimulation.get_tables() # warm up before the first request
+
+    def answer_batch(self, queries):
+        """ SimulationCounts (or the exception it raised) for each query, one bad query never fails the others. Queries with the same canonical form share one
+            simulation with the most rounds any of them asked for, and the distinct queries left after the cache
+            that have the same number of players and known board cards are simulated together in one
+            batchsimulation.simulate_stacked pass """
+        groups = {}
+        answers = [None] * len(queries)
+        for position, request in enumerate(queries):
+            try:
+                hole, board, dead, num_players, rounds = parse_query(request)
+                if dead:
+                    key = (hole, board, dead, num_players) # dead cards aren't suit-normalized, keep the query as is
+                else:
+                    key = canonical_key(hole, board, num_players)
+            except Exception as error:
+                answers[position] = error
+                continue
+            group = groups.setdefault(key, [0, []])
+            group[0] = max(group[0], rounds)
+            group[1].append(position)
+
+        # Cache hits are answered now, everything else is simulated in one stacked pass per (players, board size)
+        stacks = {}
+        for key, (rounds, positions) in groups.items():
+            counts = None
+            if len(key) == 3:
+                counts = self.cache.lookup(*key, rounds)
+            if counts is None:
+                hole, board, dead, num_players = key if len(key) == 4 else (key[0], key[1], (), key[2])
+                stacks.setdefault((num_players, len(board)), []).append((key, (hole, board, dead, rounds)))
+            else:
+                for position in positions:
+                    answers[position] = counts
+
+        for (num_players, board_size), stack in stacks.items():
+            for key, counts in zip([key for key, query in stack], self._simulate_stack(stack, num_players)):
+                if len(key) == 3 and not isinstance(counts, Exception):
+                    self.cache.store(*key, groups[key][0], counts)
+                for position in groups[key][1]:
+                    answers[position] = counts
+        return answers
+
+    def _simulate_stack(self, stack, num_players):
+        # Counts (or the exception) for each (key, query) of `stack`, from one stacked pass. Should the pass fail,
+        # each query is retried on its own so the error only reaches the queries that cause it
+        try:
+            results = batchsimulation.simulate_stacked([query for key, query in stack], num_players, self.rng)
+        except Exception as error:
+            if len(stack) == 1:
+                return [error]
+            return [counts for item in stack for counts in self._simulate_stack([item], num_players)]
+        self.passes += 1
+        self.simulations += len(stack)
+        return results
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_seconds
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                answers = await loop.run_in_executor(None, self.answer_batch, [request for request, future in batch])
+            except Exception as error: # keep serving, fail only this batch
+                answers = [error] * len(batch)
+            for (request, future), answer in zip(batch, answers):
+                if not future.done():
+                    future.set_result(answer)
+
+    async def handle(self, reader, writer):
+        # One connection: a request per line, answered in order
+        try:
+            while line := await reader.readline():
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Expected a JSON object")
+                except ValueError as error:
+                    answer = error
+                else:
+                    answer = await self.submit(request)
+                if isinstance(answer, SimulationCounts):
+                    response = format_counts(answer)
+                else:
+                    response = {"error": str(answer)}
+                if isinstance(request, dict) and "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host="127.0.0.1", port=0, started=None):
+        """ Serves on the Unix socket `path`, or on host:port. `started(address)` is called once it listens """
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.run_batches())
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+            address = path
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            address = server.sockets[0].getsockname()[:2]
+        if started is not None:
+            started(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class EquityClient:
+    """ Blocking client for one connection to the server, `address` being a Unix socket path or (host, port) """
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(address if isinstance(address, str) else tuple(address))
+        self.file = self.socket.makefile("rwb")
+
+    def query(self, hole, board="", dead="", num_players=2, rounds=ROUNDS):
+        """ Returns the response dict, raises ValueError with the server's message for a bad query """
+        request = {"hole": hole, "board": board, "dead": dead, "num_players": num_players, "rounds": rounds}
+        self.file.write(json.dumps(request).encode() + b"\n")
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Serve equity queries over a Unix socket or localhost TCP")
+    parser.add_argument("--socket", help="Unix socket path to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port when no --socket is given (default 8765)")
+    parser.add_argument("--batch-ms", type=float, default=BATCH_SECONDS * 1000, help="batching window in milliseconds")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = EquityServer(args.batch_ms / 1000, rng=args.seed)
+    started = lambda address: print(f"serving on {address}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port, started))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
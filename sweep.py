@@ -0,0 +1,231 @@
+""" Runs the (hole cards, num_players) grid that main() fills, either in this process or split across a pool
+    of worker processes. Every cell gets its own RNG stream derived from one seed (see cell_seed), so a seeded
+    sweep gives the same counts whatever the worker count or chunk size """
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from card import CARDS
+from deck import Deck
+from player import Player
+from playpokerround import PlayPokerRound
+import batchsimulation
+import stratified
+from results import SimulationCounts
+from canonical import HAND_CLASSES, hand_class
+
+from sweepoptions import PLAYER_COUNTS, BATCH_SIZE, ENGINES, check_engine
+
+
+def python_random(rng=None):
+    """ random.Random for the object engine, seeded from `rng` (a Generator, seed or None, like np.random.default_rng) """
+    return random.Random(int(np.random.default_rng(rng).integers(2**63)))
+
+
+def play_rounds(holecards, num_players, n_rounds, deck=None, board=(), dead=(), rng=None):
+    """ Plays n_rounds rounds one at a time with PlayPokerRound and returns a SimulationCounts.
+        `board` and `dead` are known community cards and cards out of play (Card objects).
+        Without a `deck`, one is made that draws from `rng` (a random.Random) """
+    if deck is None:
+        deck = Deck(rng)
+    counts = SimulationCounts(rounds=n_rounds)
+    pokerround = PlayPokerRound(num_players, holecards, deck, board, dead) # one round object, redealt every round
+    for _ in range(n_rounds):
+        pokerround.deal()
+        pokerround.get_handvalues()
+        outcome, share = pokerround.get_showdown()[0]
+        if outcome == "win":
+            counts.wins += 1
+        elif outcome == "split":
+            counts.ties += 1
+    return counts
+
+
+def play_nested_rounds(holecards, player_counts, n_rounds, deck=None, board=(), dead=(), rng=None):
+    """ play_rounds for several player counts from the same deals: each round seats max(player_counts) players,
+        and the table with k players is player1 against the first k - 1 opponents, reusing the board and every
+        hand strength. Returns {num_players: SimulationCounts} """
+    if deck is None:
+        deck = Deck(rng)
+    counts = {num_players: SimulationCounts(rounds=n_rounds) for num_players in player_counts}
+    cells = [(num_players - 1, counts[num_players]) for num_players in sorted(player_counts)]
+    pokerround = PlayPokerRound(max(player_counts), holecards, deck, board, dead)
+    for _ in range(n_rounds):
+        pokerround.deal()
+        pokerround.get_handvalues()
+        players = pokerround.players
+        hero = players[0].strength
+        best = -1
+        seats = 1
+        for last_seat, cell in cells:
+            # best = strongest of the first last_seat opponents, grown one seat at a time
+            while seats <= last_seat:
+                best = max(best, players[seats].strength)
+                seats += 1
+            if hero > best:
+                cell.wins += 1
+            elif hero == best:
+                cell.ties += 1
+    return counts
+
+
+def run_adaptive(play_batch, max_rounds, target_halfwidth, batch_size=BATCH_SIZE):
+    """ Calls play_batch(n) -> SimulationCounts in batches until the Wilson interval half-width of the win
+        probability is at most target_halfwidth, or max_rounds rounds have been played """
+    counts = play_batch(min(batch_size, max_rounds)) # the first batch's own type, so stratified batches pool their variance
+    while counts.rounds < max_rounds and counts.halfwidth() > target_halfwidth:
+        counts.add(play_batch(min(batch_size, max_rounds - counts.rounds)))
+    return counts
+
+
+def run_adaptive_nested(play_batch, max_rounds, target_halfwidth, batch_size=BATCH_SIZE):
+    # run_adaptive for play_batch(n) -> {num_players: SimulationCounts}, stopping once every player count is that narrow
+    counts = {}
+    rounds = 0
+    while rounds < max_rounds:
+        n = min(batch_size, max_rounds - rounds)
+        for num_players, batch in play_batch(n).items():
+            counts.setdefault(num_players, SimulationCounts()).add(batch)
+        rounds += n
+        if max(cell.halfwidth() for cell in counts.values()) <= target_halfwidth:
+            break
+    return counts
+
+
+def run_cell(cell):
+    """ Worker entry point. `cell` is (hole card ids, num_players, n_rounds, engine, SeedSequence, target_halfwidth,
+        batch_size). With a target_halfwidth, n_rounds is the most rounds the cell may use.
+        A tuple of player counts instead of num_players plays them all from the same deals
+        (see play_nested_rounds) and returns {num_players: SimulationCounts} """
+    hole_ids, num_players, n_rounds, engine, seed_sequence, target_halfwidth, batch_size = cell
+    nested = isinstance(num_players, tuple)
+    if engine == "vectorized":
+        rng = np.random.default_rng(seed_sequence)
+        if nested:
+            play_batch = lambda n: batchsimulation.simulate_nested_ids(hole_ids, num_players, n, rng)
+        else:
+            play_batch = lambda n: batchsimulation.simulate_ids(hole_ids, num_players, n, rng)
+    elif engine == "stratified":
+        rng = np.random.default_rng(seed_sequence)
+        play_batch = lambda n: stratified.simulate_stratified(hole_ids, num_players, n, rng)
+    else:
+        holecards = Player(CARDS[hole_ids[0]], CARDS[hole_ids[1]])
+        deck = Deck(random.Random(int(seed_sequence.generate_state(1)[0])))
+        if nested:
+            play_batch = lambda n: play_nested_rounds(holecards, num_players, n, deck)
+        else:
+            play_batch = lambda n: play_rounds(holecards, num_players, n, deck)
+
+    if target_halfwidth is None:
+        return play_batch(n_rounds)
+    if nested:
+        return run_adaptive_nested(play_batch, n_rounds, target_halfwidth, batch_size)
+    return run_adaptive(play_batch, n_rounds, target_halfwidth, batch_size)
+
+
+def cell_seed(entropy, num_players, index, done=0):
+    """ RNG stream of one cell: its position in the grid and the rounds it already holds select an independent
+        child of the run's entropy, so a resumed or extended run never repeats the samples it is added to """
+    return np.random.SeedSequence(entropy, spawn_key=(num_players, index, done))
+
+
+def make_cell(holecards, num_players, index, n_rounds, engine, entropy, done=0, target_halfwidth=None, batch_size=BATCH_SIZE):
+    # The stream is picked by hand class, not position in holecards, so a run over a subset of hands
+    # simulates those cells exactly like a run over all 169. Nested cells (num_players a tuple) use player count 0
+    hole_ids = (holecards[index].card1.id, holecards[index].card2.id)
+    seed_players = 0 if isinstance(num_players, tuple) else num_players
+    return (hole_ids, num_players, n_rounds, engine, cell_seed(entropy, seed_players, hand_class(hole_ids), done),
+            target_halfwidth, batch_size)
+
+
+def run_cells(cells, workers=1, chunksize=1, function=run_cell):
+    """ Yields the SimulationCounts of each cell in order, computed in this process (workers = 1) or in a process
+        pool of `workers` processes (None = one per core) handed `chunksize` cells at a time """
+    if workers == 1:
+        yield from map(function, cells)
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        yield from pool.map(function, cells, chunksize=chunksize)
+
+
+def all_seats_rounds(num_simulations, num_players):
+    """ Rounds the all-seats engine deals at num_players so that a hand class gets num_simulations samples on
+        average: each round is a sample for every seat, num_players of the 169 classes """
+    return -(-num_simulations * len(HAND_CLASSES) // num_players)
+
+
+def run_all_seats(task):
+    # Worker entry point of the all-seats engine, `task` being (num_players, n_rounds, SeedSequence)
+    num_players, n_rounds, seed_sequence = task
+    return batchsimulation.simulate_all_seats(num_players, n_rounds, np.random.default_rng(seed_sequence))
+
+
+def _iter_all_seats(holecards, num_simulations, entropy, workers, player_counts):
+    # One task per player count fills every hand class at once, the cells asked for are read off it
+    classes = [hand_class((cards.card1.id, cards.card2.id)) for cards in holecards]
+    tasks = [(num_players, all_seats_rounds(num_simulations, num_players), cell_seed(entropy, num_players, len(HAND_CLASSES)))
+             for num_players in player_counts]
+    for (num_players, n_rounds, seed_sequence), counts in zip(tasks, run_cells(tasks, workers, 1, run_all_seats)):
+        for index, hand in enumerate(classes):
+            yield (num_players, index), counts[hand], n_rounds if index == 0 else 0
+
+
+def _iter_nested(holecards, num_simulations, engine, entropy, workers, chunksize, player_counts, target_halfwidth, batch_size):
+    player_counts = tuple(sorted(player_counts))
+    cells = (make_cell(holecards, player_counts, index, num_simulations, engine, entropy,
+                       target_halfwidth=target_halfwidth, batch_size=batch_size)
+             for index in range(len(holecards)))
+    for index, counts in enumerate(run_cells(cells, workers, chunksize)):
+        # Every column reads the same deals, as many as the column that needed the most
+        dealt = max(cell.rounds for cell in counts.values())
+        for num_players in player_counts:
+            yield (num_players, index), counts[num_players], dealt if num_players == player_counts[0] else 0
+
+
+def _report(cells, progress):
+    # Hands each ((num_players, index), counts, rounds dealt for it) to progress and yields (key, counts)
+    for key, counts, dealt in cells:
+        if progress is not None:
+            progress(counts, dealt)
+        yield key, counts
+
+
+def iter_sweep(holecards, num_simulations, engine="vectorized", seed=None, workers=1, chunksize=1, player_counts=PLAYER_COUNTS,
+               target_halfwidth=None, batch_size=BATCH_SIZE, nested=False, progress=None):
+    """ Yields ((num_players, index into holecards), SimulationCounts) for every cell as it completes, in grid order
+        (hand by hand with nested=True). Takes the same arguments as run_sweep, for callers that write cells out
+        instead of keeping them all. `progress(counts, rounds)` is called for each cell with the rounds actually
+        dealt for it: cells that share their deals (nested, all-seats) count them once, on the first of them """
+    check_engine(engine, nested, target_halfwidth)
+    entropy = np.random.SeedSequence(seed).entropy
+    if engine == "all-seats":
+        return _report(_iter_all_seats(holecards, num_simulations, entropy, workers, player_counts), progress)
+    if nested:
+        return _report(_iter_nested(holecards, num_simulations, engine, entropy, workers, chunksize, player_counts,
+                                    target_halfwidth, batch_size), progress)
+    keys = [(num_players, index) for num_players in player_counts for index in range(len(holecards))]
+    cells = (make_cell(holecards, num_players, index, num_simulations, engine, entropy,
+                       target_halfwidth=target_halfwidth, batch_size=batch_size)
+             for num_players, index in keys)
+    return _report(((key, counts, counts.rounds) for key, counts in zip(keys, run_cells(cells, workers, chunksize))),
+                   progress)
+
+
+def run_sweep(holecards, num_simulations, engine="vectorized", seed=None, workers=1, chunksize=1, player_counts=PLAYER_COUNTS,
+              target_halfwidth=None, batch_size=BATCH_SIZE, nested=False):
+    """ Simulates every (hole cards, num_players) cell and returns {(num_players, index into holecards): SimulationCounts}.
+        workers = 1 runs in this process, otherwise cells are split across a process pool of `workers`
+        processes (None = one per core), handed out `chunksize` cells at a time.
+        With a target_halfwidth each cell stops as soon as its win probability interval is that narrow,
+        checking every batch_size rounds and never using more than num_simulations rounds.
+        nested=True deals each hand's rounds once for the largest player count and reads every smaller count off
+        the first seats of the same deals (see play_nested_rounds): about len(player_counts) times fewer rounds,
+        and the columns share their random numbers, so differences between player counts are less noisy.
+        engine = "all-seats" credits every seat of each round to its hand class (batchsimulation.simulate_all_seats),
+        one task per player count dealing enough rounds for num_simulations samples per class on average
+        (all_seats_rounds), num_players times fewer rounds than one cell at a time for the full 169 hand table.
+        The rounds are the same whatever holecards holds, so for a few hands it costs far more than other engines.
+        Pairs, with 6 combos against 12 for an offsuit hand, get fewer samples than average and suited hands fewer
+        still (4 combos) """
+    return dict(iter_sweep(holecards, num_simulations, engine, seed, workers, chunksize, player_counts,
+                           target_halfwidth, batch_size, nested))
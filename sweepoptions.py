@@ -0,0 +1,15 @@
+""" Settings of a sweep that the command line needs before anything is simulated. Kept apart from sweep.py, which
+    loads NumPy and the engines, so main.py can build its parser and check its arguments without them """
+
+PLAYER_COUNTS = range(2, 11)
+BATCH_SIZE = 500 # rounds between interval checks in adaptive mode
+ENGINES = ("object", "vectorized", "stratified", "all-seats")
+
+
+def check_engine(engine, nested=False, target_halfwidth=None):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    if nested and engine in ("stratified", "all-seats"):
+        raise ValueError(f"The {engine} engine doesn't support nested sweeps")
+    if target_halfwidth is not None and engine == "all-seats":
+        raise ValueError("The all-seats engine plays a fixed number of rounds, it can't stop at a target_halfwidth")
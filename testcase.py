@@ -1,7 +1,44 @@
 import unittest
-from card import Card
+import os
+import tempfile
+# Keep the evaluator table cache of test runs (and the processes they start) out of the real ~/.cache
+_cache_dir = tempfile.TemporaryDirectory()
+os.environ["POKER_CACHE_DIR"] = _cache_dir.name
+import contextlib
+import tracemalloc
+import threading
+import subprocess
+import sys
+import asyncio
+import io
+import itertools
+import random
+import numpy as np
+import pandas as pd
+from card import Card, card_rank, card_suit, parse_cards
+from deck import Deck
 from player import Player
 from playpokerround import PlayPokerRound
+import evaluator
+import batchsimulation
+import sweep
+import exact
+from results import SimulationCounts
+from canonical import canonical_key, hand_class, hand_label
+from equitycache import EquityCache
+import equitytable
+import checkpoint
+import benchmark
+from handrange import HandRange, range_equity
+import handrange
+from equity import equity
+import resultwriter
+import main
+import profiling
+import server as equityserver
+import loadtest
+import equitymatrix
+import stratified
 
 class TestBoardFunctions(unittest.TestCase):
 
@@ -71,7 +108,7 @@ class TestPokerRound(unittest.TestCase):
         card2 = Card("club", 9)
         player1 = Player(card1, card2)
 
-        card1 = Card("club", 9)    
+        card1 = Card("heart", 9)    
         card2 = Card("diamond", 7)
         player2 = Player(card1, card2)
 
@@ -93,10 +130,10 @@ class TestPokerRound(unittest.TestCase):
         self.assertEqual(player1.hand, [14, 10, 9, 7, 6])
 
         self.assertEqual(player2.handrank, 1)
-        self.assertEqual(player2.hand, [10, 9, 7, 7, 6])
+        self.assertEqual(player2.hand, [7, 7, 10, 9, 6])
 
         self.assertEqual(player3.handrank, 1)
-        self.assertEqual(player3.hand, [13, 10, 7, 2, 2])
+        self.assertEqual(player3.hand, [2, 2, 13, 10, 7])
 
         self.assertFalse(pokerround.get_winner())
 
@@ -143,7 +180,7 @@ class TestPokerRound(unittest.TestCase):
         self.assertTrue(pokerround.get_winner())
 
     def test_round3(self):
-        card1 = Card("club", 4)    
+        card1 = Card("diamond", 4)    
         card2 = Card("spade", 7)
         player1 = Player(card1, card2)
 
@@ -166,10 +203,10 @@ class TestPokerRound(unittest.TestCase):
 
         pokerround.get_handvalues() # Determine the value of each hand (9 = straight flush, 1 = High card)
         self.assertEqual(player1.handrank, 3)
-        self.assertEqual(player1.hand, [12, 7, 4, 4, 4])
+        self.assertEqual(player1.hand, [4, 4, 4, 12, 7])
 
         self.assertEqual(player2.handrank, 2)
-        self.assertEqual(player2.hand, [12, 12, 6, 4, 4])
+        self.assertEqual(player2.hand, [12, 12, 4, 4, 6])
 
         self.assertEqual(player3.handrank, 2)
         self.assertEqual(player3.hand, [12, 12, 5, 5, 4])
@@ -177,12 +214,12 @@ class TestPokerRound(unittest.TestCase):
         self.assertTrue(pokerround.get_winner())
     
     def test_round4(self):
-        card1 = Card("spade", 4)    
+        card1 = Card("spade", 3)    
         card2 = Card("spade", 7)
         player1 = Player(card1, card2)
 
         card1 = Card("spade", 6)    
-        card2 = Card("spade", 12)
+        card2 = Card("spade", 13)
         player2 = Player(card1, card2)
 
         card1 = Card("diamond", 12)    
@@ -200,12 +237,793 @@ class TestPokerRound(unittest.TestCase):
 
         pokerround.get_handvalues() # Determine the value of each hand (9 = straight flush, 1 = High card)
         self.assertEqual(player1.handrank, 5)
-        self.assertEqual(player1.hand, [12, 7, 4, 4, 2])
+        self.assertEqual(player1.hand, [12, 7, 4, 3, 2])
 
         self.assertEqual(player2.handrank, 5)
-        self.assertEqual(player2.hand, [12, 12, 6, 4, 2])
+        self.assertEqual(player2.hand, [13, 12, 6, 4, 2])
 
         self.assertEqual(player3.handrank, 2)
         self.assertEqual(player3.hand, [12, 12, 5, 5, 4])
 
-        self.assertFalse(pokerround.get_winner())
\ No newline at end of file
+        self.assertFalse(pokerround.get_winner())
+
+
+    def test_two_pair_compared_by_pairs_not_kicker(self):
+        # Nines and fives with an ace kicker lose to tens and fives
+        player1 = Player(Card("heart", 14), Card("heart", 9))
+        player2 = Player(Card("heart", 10), Card("club", 10))
+        pokerround = PlayPokerRound(2, player1)
+        pokerround.players.extend([player1, player2])
+        for card in [Card("club", 9), Card("club", 5), Card("diamond", 5), Card("spade", 2), Card("spade", 3)]:
+            pokerround.deal_communitycard(card)
+        pokerround.get_handvalues()
+        self.assertEqual(player1.hand, [9, 9, 5, 5, 14])
+        self.assertEqual(player2.hand, [10, 10, 5, 5, 9])
+        self.assertLess(player1.strength, player2.strength)
+        self.assertFalse(pokerround.get_winner())
+
+class TestEvaluator(unittest.TestCase):
+    def test_matches_best_five_card_combination(self):
+        # The 7 card lookup must agree with the best of the 21 five card hands
+        rng = random.Random(7)
+        deck = [Card(s, r) for s in ["heart", "diamond", "spade", "club"] for r in range(2, 15)]
+        for _ in range(500):
+            cards = rng.sample(deck, 7)
+            best = 0
+            for combination in itertools.combinations(cards, 5):
+                if len(set(card.suit for card in combination)) == 1:
+                    rankmask = sum(1 << (card.rank - 2) for card in combination)
+                    best = max(best, evaluator.load_tables()[1][rankmask])
+                else:
+                    best = max(best, evaluator.rank_strength([card.rank for card in combination]))
+            self.assertEqual(evaluator.evaluate(cards), best)
+
+    def test_two_pair_ordered_by_pairs_before_kicker(self):
+        nines_up = evaluator.rank_strength([9, 9, 5, 5, 14, 3, 2])
+        tens_up = evaluator.rank_strength([10, 10, 2, 2, 3, 4, 7])
+        self.assertEqual(evaluator.describe(nines_up), (2, [9, 9, 5, 5, 14]))
+        self.assertGreater(tens_up, nines_up)
+
+    def test_royal_flush(self):
+        cards = [Card("club", r) for r in range(10, 15)] + [Card("heart", 2), Card("spade", 2)]
+        self.assertEqual(evaluator.describe(evaluator.evaluate(cards)), (9, [14, 13, 12, 11, 10]))
+
+class TestBoardState(unittest.TestCase):
+    def test_matches_evaluate_ids(self):
+        rng = random.Random(6)
+        for size in (3, 4, 5, 5, 5):
+            for _ in range(2000):
+                cardids = rng.sample(range(52), size + 2)
+                board = evaluator.BoardState(cardids[2:])
+                self.assertEqual(board.evaluate(cardids[0], cardids[1]), evaluator.evaluate_ids(cardids))
+
+    def test_flush_suit(self):
+        board = evaluator.BoardState([Card("heart", r).id for r in (2, 9, 13)] + [Card("club", 9).id, Card("spade", 4).id])
+        self.assertEqual(board.flush_suit, 0)
+        self.assertEqual(board.evaluate(Card("heart", 3).id, Card("heart", 4).id) >> 20, 5)
+        self.assertEqual(evaluator.BoardState([Card("heart", 2).id, Card("club", 3).id]).flush_suit, -1)
+
+
+class TestDeck(unittest.TestCase):
+    def test_card_ids(self):
+        card = Card("spade", 14)
+        self.assertEqual(card.id, 38)
+        self.assertEqual((card_suit(card.id), card_rank(card.id)), ("spade", 14))
+
+    def test_deal_without_replacement(self):
+        deck = Deck()
+        deck.remove(Card("heart", 14))
+        dealt = [deck.deal_id() for _ in range(51)]
+        self.assertEqual(sorted(dealt + [Card("heart", 14).id]), list(range(52)))
+        self.assertEqual(deck.deck, [])
+
+        deck.reset()
+        self.assertEqual(len(deck.deck), 52)
+
+    def test_round_deals_distinct_cards(self):
+        player1 = Player(Card("heart", 14), Card("spade", 14))
+        pokerround = PlayPokerRound(10, player1, Deck())
+        pokerround.deal()
+        ids = [card.id for player in pokerround.players for card in player.get_cards()]
+        ids += [card.id for card in pokerround.communitycards]
+        self.assertEqual(len(set(ids)), 25)
+
+
+class TestBatchSimulation(unittest.TestCase):
+    def test_evaluate_array_matches_evaluator(self):
+        rng = random.Random(3)
+        hands = [rng.sample(range(52), 7) for _ in range(300)]
+        strengths = batchsimulation.evaluate_array(np.array(hands))
+        self.assertEqual(strengths.tolist(), [evaluator.evaluate_ids(hand) for hand in hands])
+
+    def test_simulate_is_seeded(self):
+        player1 = Player(Card("heart", 14), Card("spade", 14))
+        counts = batchsimulation.simulate(player1, 3, 2500, rng=11, block_size=1000)
+        self.assertEqual(counts.rounds, 2500)
+        self.assertEqual(counts, batchsimulation.simulate(player1, 3, 2500, rng=11, block_size=1000))
+        self.assertGreater(counts.win_probability(), 0.6) # AA wins about 73% three-handed
+
+
+class TestSweep(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        deck = Deck()
+        deck.get_uniqueholecards()
+        holecards = deck.uniqueholecards[:4]
+        serial = sweep.run_sweep(holecards, 200, seed=5, player_counts=[2, 6])
+        parallel = sweep.run_sweep(holecards, 200, seed=5, workers=2, chunksize=3, player_counts=[2, 6])
+        self.assertEqual(serial, parallel)
+        self.assertEqual(sorted(serial), [(n, i) for n in [2, 6] for i in range(4)])
+
+
+class TestExactEquity(unittest.TestCase):
+    def test_matches_brute_force_on_the_turn(self):
+        # Hero and board leave diamonds and clubs interchangeable, so runouts get merged
+        hole = (Card("spade", 14).id, Card("spade", 13).id)
+        board = tuple(Card("heart", r).id for r in (2, 3, 4)) + (Card("spade", 9).id,)
+        unknown = [cardid for cardid in range(52) if cardid not in hole + board]
+        wins = ties = rounds = 0
+        for river in unknown:
+            hero = evaluator.evaluate_ids(hole + board + (river,))
+            for opponent in itertools.combinations([cardid for cardid in unknown if cardid != river], 2):
+                strength = evaluator.evaluate_ids(opponent + board + (river,))
+                wins += hero > strength
+                ties += hero == strength
+                rounds += 1
+        self.assertEqual(exact.exact_equity(hole, board), SimulationCounts(wins, ties, rounds))
+
+    def test_round_exact_equity_on_the_river(self):
+        pokerround = PlayPokerRound(2, Player(Card("heart", 14), Card("spade", 14)))
+        for card in [Card("club", 14), Card("diamond", 14), Card("heart", 2), Card("spade", 7), Card("club", 9)]:
+            pokerround.deal_communitycard(card)
+        counts = pokerround.get_exact_equity()
+        self.assertEqual((counts.wins, counts.ties, counts.rounds), (990, 0, 990)) # quad aces can't lose
+
+    def test_refuses_preflop_and_multiway(self):
+        with self.assertRaises(ValueError):
+            exact.exact_equity((0, 1))
+        with self.assertRaises(ValueError):
+            exact.exact_equity((0, 1), (2, 3, 4), num_players=3)
+
+
+class TestAdaptiveSampling(unittest.TestCase):
+    def test_wilson_interval(self):
+        low, high = SimulationCounts(wins=50, rounds=100).wilson_interval()
+        self.assertAlmostEqual(low, 0.4038, places=4)
+        self.assertAlmostEqual(high, 0.5962, places=4)
+
+    def test_stops_once_interval_is_narrow_enough(self):
+        play_batch = lambda n: SimulationCounts(wins=n // 2, rounds=n)
+        counts = sweep.run_adaptive(play_batch, max_rounds=100000, target_halfwidth=0.05, batch_size=100)
+        self.assertEqual(counts.rounds, 400) # half-width is about 0.049 after 400 rounds at p = 0.5
+        self.assertEqual(sweep.run_adaptive(play_batch, 250, 0.0, 100).rounds, 250)
+
+
+class TestEquityCache(unittest.TestCase):
+    def test_isomorphic_queries_share_a_key(self):
+        ah_kh = (Card("heart", 14).id, Card("heart", 13).id)
+        ks_as = (Card("spade", 13).id, Card("spade", 14).id)
+        board_h = (Card("heart", 2).id, Card("club", 7).id, Card("diamond", 9).id)
+        board_s = (Card("diamond", 9).id, Card("spade", 2).id, Card("heart", 7).id)
+        self.assertEqual(canonical_key(ah_kh, board_h, 3), canonical_key(ks_as, board_s, 3))
+        self.assertNotEqual(canonical_key(ah_kh, board_h, 3), canonical_key(ah_kh, board_h, 4))
+        # A suited and an offsuit hand are never isomorphic
+        self.assertNotEqual(canonical_key(ah_kh), canonical_key((Card("heart", 14).id, Card("spade", 13).id)))
+
+    def test_cache_hits_and_eviction(self):
+        calls = []
+        def simulate(hole, board, num_players, n_rounds, rng):
+            calls.append(hole)
+            return SimulationCounts(rounds=n_rounds)
+
+        cache = EquityCache(maxsize=2, simulate=simulate)
+        cache.get_equity((0, 13), num_players=2, n_rounds=10) # 2h 2d
+        cache.get_equity((26, 39), num_players=2, n_rounds=10) # 2s 2c, same class
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.get_equity((0, 1), n_rounds=10)
+        cache.get_equity((0, 2), n_rounds=10) # evicts the pair of 2s
+        cache.get_equity((0, 13), n_rounds=10)
+        self.assertEqual(len(calls), 4)
+
+    def test_simulates_with_known_board(self):
+        # Quad aces with the board known can't lose to anything but a straight flush
+        cache = EquityCache(rng=1)
+        board = (Card("club", 14).id, Card("diamond", 14).id, Card("heart", 2).id, Card("spade", 7).id, Card("club", 9).id)
+        counts = cache.get_equity((Card("heart", 14).id, Card("spade", 14).id), board, 4, 500)
+        self.assertEqual(counts.wins, 500)
+
+
+class TestEquityTable(unittest.TestCase):
+    def test_write_and_memmap_lookup(self):
+        counts = {(num_players, index): SimulationCounts(index, num_players, 1000)
+                  for num_players in range(2, 5) for index in range(169)}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "equity.peq")
+            equitytable.write_table(path, counts)
+            table = equitytable.EquityTable(path)
+            aces = (Card("club", 14).id, Card("diamond", 14).id)
+            self.assertEqual(table.lookup(aces, 3), counts[3, hand_class(aces)])
+            self.assertEqual(table.win_probability(aces, 4), hand_class(aces) / 1000)
+            with self.assertRaises(KeyError):
+                table.lookup(aces, 5)
+
+    def test_hand_class_ignores_suits_and_order(self):
+        self.assertEqual(hand_class((Card("heart", 2).id, Card("spade", 2).id)), 0)
+        self.assertEqual(hand_class((Card("club", 13).id, Card("club", 14).id)),
+                         hand_class((Card("heart", 14).id, Card("heart", 13).id)))
+        self.assertNotEqual(hand_class((Card("club", 13).id, Card("heart", 14).id)),
+                            hand_class((Card("heart", 14).id, Card("heart", 13).id)))
+
+    def test_counts_from_dataframe(self):
+        df = pd.DataFrame({"Win % for 2 players": [0.5] * 169, "Samples for 2 players": [200] * 169})
+        counts = equitytable.counts_from_dataframe(df)
+        self.assertEqual(counts[2, 168], SimulationCounts(100, 0, 200))
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_resume_and_add_samples(self):
+        deck = Deck()
+        deck.get_uniqueholecards()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.peq")
+            # Pretend an earlier run stopped after finishing one cell and half of another
+            checkpoint.save_counts(path, {(2, 0): SimulationCounts(60, 2, 100), (2, 1): SimulationCounts(20, 0, 50)})
+
+            counts = checkpoint.run_checkpointed(path, deck.uniqueholecards, 100, seed=3, player_counts=[2])
+            self.assertEqual(counts[2, 0], SimulationCounts(60, 2, 100)) # already done, not rerun
+            self.assertTrue(all(cell.rounds == 100 for cell in counts.values()))
+            self.assertEqual(checkpoint.load_counts(path), counts)
+
+            counts = checkpoint.run_checkpointed(path, deck.uniqueholecards, 50, seed=3, player_counts=[2], add=True)
+            self.assertTrue(all(cell.rounds == 150 for cell in counts.values()))
+            self.assertEqual(checkpoint.load_counts(path)[2, 0].rounds, 150)
+
+    def test_adaptive(self):
+        holecards = main.get_holecards("AA")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.peq")
+            counts = checkpoint.run_checkpointed(path, holecards, 2000, seed=3, player_counts=[2], target_halfwidth=0.05,
+                                                 batch_size=100)
+            cell = next(cell for cell in counts.values() if cell.rounds)
+            self.assertLess(cell.rounds, 2000)
+            self.assertLessEqual(cell.halfwidth(), 0.05)
+            simulated = []
+            checkpoint.run_checkpointed(path, holecards, 2000, seed=3, player_counts=[2], target_halfwidth=0.05,
+                                        batch_size=100, progress=simulated.append)
+            self.assertEqual(simulated, []) # already narrow enough
+
+    def test_padded_columns_not_simulated(self):
+        # Columns 3-9 are stored as zero rounds between 2 and 10, rerunning must not fill them
+        holecards = main.get_holecards("AA")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.peq")
+            checkpoint.run_checkpointed(path, holecards, 100, seed=3, player_counts=[2, 10])
+            simulated = []
+            counts = checkpoint.run_checkpointed(path, holecards, 100, seed=3, player_counts=[2, 10], progress=simulated.append)
+            self.assertEqual(simulated, [])
+            aces = hand_class(HandRange.parse("AA").combos[0].tolist())
+            self.assertEqual([counts[num_players, aces].rounds for num_players in range(2, 11)], [100] + [0] * 7 + [100])
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_compare_flags_slowdowns_beyond_tolerance(self):
+        baseline = {"deal": {"rate": 1000.0}, "evaluate": {"rate": 1000.0}}
+        results = {"deal": {"rate": 850.0}, "evaluate": {"rate": 700.0}, "new": {"rate": 1.0}}
+        self.assertEqual(benchmark.compare(results, baseline, 0.2), [("evaluate", 700.0, 1000.0)])
+
+
+class TestHandRange(unittest.TestCase):
+    def test_parse_combo_counts(self):
+        self.assertEqual(len(HandRange.parse("QQ+,AKs")), 22)
+        self.assertEqual(len(HandRange.parse("QQ-99")), 24)
+        self.assertEqual(len(HandRange.parse("A9s+")), 20)
+        self.assertEqual(len(HandRange.parse("A5s-A2s, KTo+")), 16 + 36)
+        self.assertEqual(len(HandRange.parse("AK,AKs")), 16) # overlapping parts count once
+        self.assertEqual(HandRange.parse("AhKh").combos.tolist(), [[Card("heart", 13).id, Card("heart", 14).id]])
+        self.assertEqual(HandRange.parse("AA:0.5,KK").weights.sum(), 9.0)
+        with self.assertRaises(ValueError):
+            HandRange.parse("AXs")
+
+    def test_sample_skips_dealt_cards(self):
+        aces = HandRange.parse("AA")
+        rng = np.random.default_rng(0)
+        used = [Card("heart", 14).id, Card("spade", 14).id]
+        for _ in range(20):
+            self.assertEqual(sorted(aces.sample(used, rng)), [Card("diamond", 14).id, Card("club", 14).id])
+        with self.assertRaises(ValueError):
+            aces.sample(used + [Card("club", 14).id], rng)
+
+    def test_range_equity(self):
+        # AA against KK is about 82% heads-up
+        counts = range_equity(Player(Card("heart", 14), Card("spade", 14)), ["KK"], 2000, rng=4)
+        self.assertEqual(counts.rounds, 2000)
+        self.assertAlmostEqual(counts.win_probability(), 0.82, delta=0.04)
+
+    def test_range_equity_too_many_opponents(self):
+        with self.assertRaises(ValueError):
+            range_equity("AA", ["KK", "QQ"], 100, num_players=2)
+        with self.assertRaises(ValueError):
+            PlayPokerRound(2, Player(Card("heart", 14), Card("spade", 14))).deal(
+                [Player(Card("heart", 13), Card("spade", 13)), Player(Card("heart", 12), Card("spade", 12))])
+
+    def test_range_equity_blockers(self):
+        # AhAs leaves 8 AK combos, each QQ combo all 16, so AhAs is dealt in 8 of every 104 matchups, not 1 in 7
+        hero, villain = HandRange.parse("AhAs,QQ"), HandRange.parse("AK")
+        self.assertEqual(handrange.unblocked_weight(hero, villain).tolist(), [8] + [16] * 6)
+        counts = range_equity(hero, ["AK"], 20000, rng=5)
+        self.assertAlmostEqual(counts.win_probability(), 0.585, delta=0.012)
+
+
+class TestBoardEquity(unittest.TestCase):
+    def test_round_keeps_known_board_and_skips_dead_cards(self):
+        board = [Card("heart", 12), Card("heart", 11), Card("club", 2)]
+        dead = [Card("heart", 9), Card("heart", 10)]
+        pokerround = PlayPokerRound(9, Player(Card("heart", 14), Card("heart", 13)), Deck(), board, dead)
+        pokerround.deal()
+        self.assertEqual(pokerround.communitycards[:3], board)
+        self.assertEqual(len(pokerround.communitycards), 5)
+        ids = [card.id for player in pokerround.players for card in player.get_cards()]
+        ids += [card.id for card in pokerround.communitycards + dead]
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_engines_agree(self):
+        # Royal flush draw with one card to come, the 10 of hearts is dead
+        self.assertEqual(equity("AhKh", "Qh Jh 2c 3d", "Th").rounds, 10000)
+        exact_counts = equity("AhKh", "Qh Jh 2c 3d", "Th", engine="exact")
+        vectorized = equity("AhKh", "Qh Jh 2c 3d", "Th", n_rounds=4000, rng=2)
+        self.assertAlmostEqual(vectorized.win_probability(), exact_counts.win_probability(), delta=0.03)
+
+    def test_rejects_repeated_cards(self):
+        with self.assertRaises(ValueError):
+            equity("AhKh", "Ah 2c 3d")
+        with self.assertRaises(ValueError):
+            equity("Ah", "2c 3d")
+
+    def test_rejects_bad_input(self):
+        for hole, num_players in (([60, 1], 2), ([-1, 1], 2), (["x", 1], 2), ([1.0, 2], 2), ("AhKh", 1)):
+            with self.assertRaises(ValueError):
+                equity(hole, num_players=num_players)
+
+
+class TestShowdown(unittest.TestCase):
+    def test_every_seat_gets_an_outcome(self):
+        # player1 and player3 both make a king high straight with a 9, player2 has only a pair
+        player1 = Player(Card("heart", 9), Card("club", 2))
+        player2 = Player(Card("spade", 5), Card("club", 5))
+        player3 = Player(Card("diamond", 9), Card("diamond", 2))
+        pokerround = PlayPokerRound(3, player1)
+        pokerround.players.extend([player1, player2, player3])
+        for card in [Card("heart", 10), Card("spade", 11), Card("club", 12), Card("diamond", 13), Card("heart", 4)]:
+            pokerround.deal_communitycard(card)
+        pokerround.get_handvalues()
+        self.assertEqual(pokerround.get_showdown(), [("split", 0.5), ("loss", 0.0), ("split", 0.5)])
+        self.assertFalse(pokerround.get_winner())
+
+    def test_showdown_array(self):
+        strengths = np.array([[5, 3, 1], [4, 4, 2], [7, 7, 7]])
+        self.assertEqual(batchsimulation.showdown(strengths).tolist(), [[1, 0, 0], [0.5, 0.5, 0], [1 / 3] * 3])
+
+    def test_all_seats_recorded(self):
+        counts = batchsimulation.simulate_all_seats(4, 1000, rng=1)
+        self.assertEqual(sum(cell.rounds for cell in counts.values()), 4000)
+        # Exactly one seat wins outright in every round that isn't split
+        wins = sum(cell.wins for cell in counts.values())
+        self.assertLessEqual(wins, 1000)
+        self.assertGreater(wins, 900)
+
+    def test_all_seats_sweep(self):
+        holecards = main.get_holecards("AA,72o")
+        counts = sweep.run_sweep(holecards, 2000, "all-seats", seed=1, player_counts=[2, 6])
+        self.assertEqual(sorted(counts), [(2, 0), (2, 1), (6, 0), (6, 1)])
+        aces = next(index for index, cards in enumerate(holecards) if cards.card1.rank == cards.card2.rank)
+        # 2000 * 169 / 2 heads-up rounds, about 0.76 * 2000 of them deal AA to a seat
+        self.assertAlmostEqual(counts[2, aces].rounds, 1530, delta=150)
+        self.assertAlmostEqual(counts[2, aces].win_probability(), 0.85, delta=0.04)
+        self.assertEqual(counts, sweep.run_sweep(holecards, 2000, "all-seats", seed=1, player_counts=[2, 6], workers=2))
+        with self.assertRaises(ValueError):
+            sweep.run_sweep(holecards, 2000, "all-seats", target_halfwidth=0.01)
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main.main_cli(["-e", "all-seats", "--hands", "AA", "-o", "out.csv"])
+
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestResultWriter(unittest.TestCase):
+    def write_rows(self, path, format=None):
+        player = Player(Card("heart", 14), Card("heart", 13))
+        with resultwriter.open_writer(path, format, chunk_rows=2) as writer:
+            for num_players in range(2, 7):
+                writer.write(resultwriter.make_row(player, num_players, SimulationCounts(30, 5, 100)))
+        return writer
+
+    def test_csv_in_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.csv")
+            writer = self.write_rows(path)
+            self.assertEqual(writer.rows_written, 5)
+            df = pd.read_csv(path)
+            self.assertEqual(df.columns.tolist(), resultwriter.COLUMNS)
+            self.assertEqual(df["hand"].tolist(), ["AKs"] * 5)
+            self.assertEqual(df["num_players"].tolist(), [2, 3, 4, 5, 6])
+            self.assertAlmostEqual(df["win_probability"][0], 0.3)
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_and_arrow(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_rows(os.path.join(directory, "results.parquet"))
+            self.write_rows(os.path.join(directory, "results.arrow"))
+            self.assertEqual(len(pd.read_parquet(os.path.join(directory, "results.parquet"))), 5)
+            self.assertEqual(pd.read_feather(os.path.join(directory, "results.arrow"))["wins"].tolist(), [30] * 5)
+
+    def test_hand_labels(self):
+        self.assertEqual(hand_label((Card("club", 14).id, Card("heart", 14).id)), "AA")
+        self.assertEqual(hand_label((Card("club", 2).id, Card("heart", 10).id)), "T2o")
+        with self.assertRaises(ValueError):
+            resultwriter.open_writer("results.xlsx")
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_player_counts(self):
+        self.assertEqual(main.parse_player_counts("2-10"), list(range(2, 11)))
+        self.assertEqual(main.parse_player_counts("6,2,3"), [2, 3, 6])
+        self.assertEqual(main.parse_player_counts("2-4,9"), [2, 3, 4, 9])
+        with self.assertRaises(ValueError):
+            main.parse_player_counts("1-3")
+
+    def test_select_hands(self):
+        deck = Deck()
+        deck.get_uniqueholecards()
+        labels = [hand_label((cards.card1.id, cards.card2.id)) for cards in main.select_hands(deck.uniqueholecards, "QQ+,AK")]
+        self.assertEqual(sorted(labels), ["AA", "AKo", "AKs", "KK", "QQ"])
+
+    def test_subset_matches_full_sweep(self):
+        # A cell is seeded by its hand class, so running a few hands gives the same counts as running all 169
+        deck = Deck()
+        deck.get_uniqueholecards()
+        subset = main.select_hands(deck.uniqueholecards, "AA")
+        full = sweep.run_sweep(deck.uniqueholecards, 200, seed=3, player_counts=[3])
+        self.assertEqual(sweep.run_sweep(subset, 200, seed=3, player_counts=[3])[3, 0], full[3, deck.uniqueholecards.index(subset[0])])
+
+    def test_csv_output_with_progress(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.csv")
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                main.main_cli(["-n", "100", "-p", "2,6", "--hands", "AA,72o", "-s", "1", "-o", path])
+            df = pd.read_csv(path)
+            self.assertEqual(len(df), 4)
+            self.assertEqual(df["rounds"].tolist(), [100] * 4)
+            self.assertIn("4/4 cells", stderr.getvalue())
+            self.assertIn("rounds/s", stderr.getvalue())
+
+
+class TestReproducibleRuns(unittest.TestCase):
+    def test_seeded_deck(self):
+        deals = []
+        for _ in range(2):
+            deck = Deck(random.Random(5))
+            deals.append(deck.deal_ids(19))
+        self.assertEqual(deals[0], deals[1])
+        self.assertEqual(len(set(deals[0])), 19)
+        self.assertEqual(deck.dealt, 19)
+        self.assertEqual(sorted(deck.cards), list(range(52)))
+
+    def test_bulk_deal_skips_removed_cards(self):
+        deck = Deck(random.Random(2))
+        for cardid in range(40):
+            deck.remove_id(cardid)
+        self.assertEqual(sorted(deck.deal_ids(12)), list(range(40, 52)))
+
+    def test_seeded_rounds_ignore_global_random(self):
+        player1 = Player(Card("heart", 14), Card("spade", 14))
+        random.seed(1)
+        first = sweep.play_rounds(player1, 4, 300, rng=random.Random(8))
+        random.seed(2)
+        self.assertEqual(sweep.play_rounds(player1, 4, 300, rng=random.Random(8)), first)
+
+    def test_bit_identical_tables(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ("first.peq", "second.peq")]
+            for path, workers in zip(paths, ["1", "2"]):
+                main.main_cli(["-q", "-n", "50", "-e", "object", "-p", "2,7", "-s", "11", "-w", workers, "-o", path])
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(main.main_cli(["-q", "-n", "50", "-e", "object", "-p", "2,7", "-s", "11",
+                                                "-o", paths[1], "--expect", paths[0]]), 0)
+                self.assertEqual(main.main_cli(["-q", "-n", "50", "-e", "object", "-p", "2,7", "-s", "12",
+                                                "-o", paths[1], "--expect", paths[0]]), 1)
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+    def test_stage_timings(self):
+        deal = PlayPokerRound.deal
+        profiling.enable()
+        self.assertIsNot(PlayPokerRound.deal, deal)
+        sweep.play_rounds(Player(Card("heart", 14), Card("spade", 13)), 3, 40, rng=random.Random(1))
+        timings = profiling.get_timings()
+        self.assertEqual(timings["PlayPokerRound.deal"][0], 40)
+        self.assertEqual(timings["PlayPokerRound.get_handvalues"][0], 40)
+        self.assertEqual(timings["Deck.remove"][0], 80)
+        self.assertIn("PlayPokerRound.deal", profiling.report())
+        profiling.disable()
+        self.assertIs(PlayPokerRound.deal, deal)
+
+    def test_profile_wrapper(self):
+        text = io.StringIO()
+        self.assertEqual(profiling.profile(sum, [1, 2, 3], stream=text), 6)
+        self.assertIn("function calls", text.getvalue())
+
+
+class TestObjectReuse(unittest.TestCase):
+    def test_sevencards_replaced(self):
+        player = Player(Card("heart", 14), Card("spade", 14))
+        board = [Card("club", 2), Card("club", 7), Card("diamond", 9), Card("heart", 11), Card("spade", 4)]
+        for _ in range(3):
+            player.get_sevencards(board)
+            player.get_best_poker_hand()
+        self.assertEqual(len(player.sevencards), 7)
+        self.assertEqual(player.handrank, 1)
+        player.reset(Card("heart", 2), Card("spade", 3))
+        self.assertEqual((player.sevencards, player.handrank), ([], -1))
+        with self.assertRaises(AttributeError):
+            player.nickname = "slots"
+
+    def test_round_redealt_in_place(self):
+        player1 = Player(Card("heart", 14), Card("spade", 13))
+        pokerround = PlayPokerRound(6, player1, rng=random.Random(4))
+        seats = list(pokerround.seats)
+        for _ in range(50):
+            pokerround.deal()
+            pokerround.get_handvalues()
+            self.assertEqual(len(pokerround.players), 6)
+            self.assertEqual(len(pokerround.communitycards), 5)
+            ids = [card.id for player in pokerround.players for card in player.get_cards()]
+            ids += [card.id for card in pokerround.communitycards]
+            self.assertEqual(len(set(ids)), 17)
+        self.assertEqual(pokerround.seats, seats)
+        self.assertEqual(pokerround.players[1:], seats[:5])
+
+    def test_memory_stays_flat(self):
+        player1 = Player(Card("heart", 14), Card("spade", 13))
+        deck = Deck(random.Random(1))
+        sweep.play_rounds(player1, 9, 200, deck)
+        tracemalloc.start()
+        sweep.play_rounds(player1, 9, 200, deck)
+        small = tracemalloc.get_traced_memory()[0]
+        sweep.play_rounds(player1, 9, 5000, deck)
+        large = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertLess(large - small, 4096)
+
+
+class TestNestedSweep(unittest.TestCase):
+    def test_vectorized_columns(self):
+        hole = (Card("heart", 14).id, Card("spade", 13).id)
+        counts = batchsimulation.simulate_nested_ids(hole, range(2, 11), 3000, np.random.default_rng(4), block_size=700)
+        # The 10 player column is exactly the plain simulation of the same deals
+        self.assertEqual(counts[10], batchsimulation.simulate_ids(hole, 10, 3000, np.random.default_rng(4), block_size=700))
+        # An extra opponent can only turn a win into a tie or a loss
+        wins = [counts[num_players].wins for num_players in range(2, 11)]
+        self.assertEqual(wins, sorted(wins, reverse=True))
+
+    def test_object_columns(self):
+        player1 = Player(Card("heart", 7), Card("heart", 8))
+        counts = sweep.play_nested_rounds(player1, [2, 4, 6], 400, rng=random.Random(3))
+        self.assertEqual(counts[6], sweep.play_rounds(player1, 6, 400, rng=random.Random(3)))
+        self.assertGreaterEqual(counts[2].wins, counts[4].wins)
+        self.assertGreaterEqual(counts[4].wins, counts[6].wins)
+
+    def test_nested_sweep(self):
+        deck = Deck()
+        deck.get_uniqueholecards()
+        holecards = deck.uniqueholecards[:3]
+        for engine in ("vectorized", "object"):
+            counts = sweep.run_sweep(holecards, 200, engine, seed=2, player_counts=[2, 3, 9], nested=True)
+            self.assertEqual(sorted(counts), [(num_players, index) for num_players in (2, 3, 9) for index in range(3)])
+            self.assertEqual(counts, sweep.run_sweep(holecards, 200, engine, seed=2, workers=2, player_counts=[2, 3, 9], nested=True))
+            adaptive = sweep.run_sweep(holecards, 2000, engine, seed=2, player_counts=[2, 9], nested=True,
+                                       target_halfwidth=0.05, batch_size=100)
+            self.assertTrue(all(cell.rounds < 2000 for cell in adaptive.values()))
+
+    def test_progress_counts_shared_deals_once(self):
+        holecards = main.get_holecards("AA,72o")
+        for engine, nested, dealt in (("vectorized", True, 2 * 1000), ("all-seats", False, sum(
+                sweep.all_seats_rounds(1000, num_players) for num_players in range(2, 11)))):
+            progress = main.Progress(2 * 9, stream=io.StringIO())
+            dict(sweep.iter_sweep(holecards, 1000, engine, seed=1, nested=nested, progress=progress))
+            self.assertEqual((progress.cells, progress.rounds), (18, dealt))
+
+
+class TestEquityMatrix(unittest.TestCase):
+    def test_counts_match_brute_force(self):
+        boards = np.array([[0, 14, 28, 42, 9], [3, 4, 5, 20, 51]])
+        wins, ties, deals = equitymatrix.count_boards(boards)
+        for label1, label2 in [("AA", "KK"), ("AKs", "AQo"), ("76s", "76s"), ("32o", "AA")]:
+            a, b = HandRange.parse(label1), HandRange.parse(label2)
+            expected = [0, 0, 0]
+            for board in boards.tolist():
+                for combo1 in a.combos.tolist():
+                    for combo2 in b.combos.tolist():
+                        if len(set(combo1 + combo2 + board)) < 9:
+                            continue
+                        strength1 = evaluator.evaluate_ids(combo1 + board)
+                        strength2 = evaluator.evaluate_ids(combo2 + board)
+                        expected = [expected[0] + (strength1 > strength2), expected[1] + (strength1 == strength2), expected[2] + 1]
+            cell = (hand_class(a.combos[0].tolist()), hand_class(b.combos[0].tolist()))
+            self.assertEqual([wins[cell], ties[cell], deals[cell]], expected)
+
+    def test_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "preflop.pkmx")
+            equitymatrix.write_matrix(path, *equitymatrix.build_matrix(300, rng=1))
+            matrix = equitymatrix.EquityMatrix(path)
+            self.assertAlmostEqual(matrix.equity("AA", "KK"), 0.82, delta=0.04)
+            self.assertAlmostEqual(matrix.equity("AA", "KK") + matrix.equity("KK", "AA"), 1)
+            self.assertEqual(matrix.equity("AKo", "AKo"), 0.5)
+            self.assertEqual(matrix.equity("AhKh", "QQ"), matrix.equity("AKs", "QQ"))
+            with self.assertRaises(ValueError):
+                matrix.equity("AhKh", "AhAd") # can't be dealt together
+            # AhKh removes the three AA combos holding Ah, and AhKd
+            self.assertEqual(equitymatrix.class_weights("AA,AhKd", blockers=parse_cards("AhKh")).sum(), 0.5)
+            pair = matrix.equity("AKs", "QQ,JJ")
+            self.assertTrue(min(matrix.equity("AKs", "QQ"), matrix.equity("AKs", "JJ")) <= pair <= max(
+                matrix.equity("AKs", "QQ"), matrix.equity("AKs", "JJ")))
+            matrix_equity = matrix.get_matrix()
+            self.assertEqual(matrix_equity.shape, (169, 169))
+            self.assertLess(np.nanmax(np.abs(matrix_equity + matrix_equity.T - 1)), 1e-9)
+
+
+class TestStratifiedSampling(unittest.TestCase):
+    def test_texture_probabilities(self):
+        flops, probabilities = stratified.flop_strata((12, 25)) # AcAd
+        self.assertEqual(sum(len(stratum) for stratum in flops), 19600)
+        self.assertAlmostEqual(probabilities.sum(), 1)
+        for texture, stratum in enumerate(flops):
+            self.assertTrue((stratified.flop_texture(stratum) == texture).all())
+        self.assertEqual(stratified.flop_texture(np.array([0, 13, 1])), stratified.TEXTURES.index("two-tone paired"))
+        allocation = stratified.allocate(1000, probabilities)
+        self.assertEqual(allocation.sum(), 1000)
+        self.assertTrue((allocation >= stratified.MIN_ROUNDS).all())
+        self.assertEqual(stratified.flop_texture(np.array([[0, 1, 2], [0, 14, 28]])).tolist(),
+                         [stratified.TEXTURES.index("monotone"), stratified.TEXTURES.index("rainbow")])
+
+    def test_control_means(self):
+        # Average of the control variates over every flop-texture-weighted deal is the hypergeometric mean
+        hole = (0, 14) # 2c 3d
+        counts = stratified._controls(hole, np.random.default_rng(0).permuted(
+            np.broadcast_to([cardid for cardid in range(52) if cardid not in hole], (50000, 50)), axis=1)[:, :5])
+        np.testing.assert_allclose(counts.mean(axis=0), stratified.control_means(hole), atol=0.01)
+
+    def test_estimate(self):
+        exact_win = 0.2930 # 2c 3d heads-up, about 29.3% outright wins
+        counts = stratified.simulate_stratified((0, 14), 2, 20000, rng=1)
+        low, high = counts.wilson_interval()
+        self.assertEqual(counts.rounds, 20000)
+        self.assertTrue(low - 0.005 <= exact_win <= high + 0.005)
+        self.assertGreater(counts.effective_rounds, counts.rounds)
+        self.assertLess(counts.halfwidth(), batchsimulation.simulate_ids((0, 14), 2, 20000, 1).halfwidth())
+
+    def test_sweep(self):
+        holecards = main.get_holecards("AA,32o")
+        counts = sweep.run_sweep(holecards, 4000, "stratified", seed=2, player_counts=[2], target_halfwidth=0.02, batch_size=500)
+        for cell in counts.values():
+            self.assertLessEqual(cell.halfwidth(), 0.02)
+            self.assertLess(cell.rounds, 4000)
+        self.assertEqual(counts, sweep.run_sweep(holecards, 4000, "stratified", seed=2, player_counts=[2],
+                                                 target_halfwidth=0.02, batch_size=500))
+        with self.assertRaises(ValueError):
+            sweep.run_sweep(holecards, 100, "stratified", nested=True)
+
+    def test_exact_rounds(self):
+        for n_rounds in (0, 1, 7, 99, 100, 1003):
+            self.assertEqual(stratified.simulate_stratified((12, 25), 2, n_rounds, rng=1).rounds, n_rounds)
+        play_batch = lambda n: stratified.simulate_stratified((0, 14), 2, n, rng=2)
+        self.assertEqual(sweep.run_adaptive(play_batch, 1003, 0.0, 500).rounds, 1003)
+
+
+class TestEquityServer(unittest.TestCase):
+    def test_batch_coalescing(self):
+        server = equityserver.EquityServer(rng=1)
+        answers = server.answer_batch([{"hole": "AhKh", "board": "2c7d9s", "rounds": 500},
+                                       {"hole": "AsKs", "board": "2h7d9c", "rounds": 800},
+                                       {"hole": "AhKh", "dead": "Qc", "rounds": 300},
+                                       {"hole": "AhAh"}])
+        self.assertIs(answers[0], answers[1]) # same query up to suits, simulated once with the most rounds
+        self.assertEqual(answers[0].rounds, 800)
+        self.assertEqual(answers[2].rounds, 300)
+        self.assertIsInstance(answers[3], ValueError)
+        self.assertEqual(server.simulations, 2)
+        self.assertEqual(server.passes, 2) # one per board size
+
+    def test_bad_query_fails_alone(self):
+        server = equityserver.EquityServer(rng=4)
+        answers = server.answer_batch([{"hole": [60, 1]}, {"hole": [-1, 1]}, {"hole": "AhKh", "rounds": 500}])
+        self.assertIsInstance(answers[0], ValueError)
+        self.assertIsInstance(answers[1], ValueError)
+        self.assertEqual(answers[2].rounds, 500)
+
+        # An error inside the stacked pass is retried query by query
+        stack = [(None, ((12, 25), (), (), 200)), (None, ((12, 25), (), (), -5))]
+        results = server._simulate_stack(stack, 2)
+        self.assertEqual(results[0].rounds, 200)
+        self.assertIsInstance(results[1], Exception)
+
+    def test_distinct_queries_share_a_pass(self):
+        server = equityserver.EquityServer(rng=3)
+        queries = [{"hole": "AhAd", "rounds": 4000}, {"hole": "7h2c", "rounds": 3000}, {"hole": "KsQs", "dead": "Ah", "rounds": 2000}]
+        aces, seven_deuce, kings = server.answer_batch(queries)
+        self.assertEqual((server.passes, server.simulations), (1, 3))
+        self.assertEqual([aces.rounds, seven_deuce.rounds, kings.rounds], [4000, 3000, 2000])
+        self.assertAlmostEqual(aces.win_probability(), 0.85, delta=0.02)
+        self.assertAlmostEqual(seven_deuce.win_probability(), 0.32, delta=0.03)
+        server.answer_batch(queries[:1]) # cached
+        self.assertEqual(server.passes, 1)
+
+    def test_client_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "poker.sock")
+            server = equityserver.EquityServer(rng=2)
+            ready = threading.Event()
+            thread = threading.Thread(target=asyncio.run, args=(server.serve(path, started=lambda address: ready.set()),),
+                                      daemon=True)
+            thread.start()
+            ready.wait()
+            with equityserver.EquityClient(path) as client:
+                response = client.query("AhAd", num_players=3, rounds=1000)
+                self.assertEqual(response["rounds"], 1000)
+                self.assertEqual(response["wins"] + response["ties"] + response["losses"], 1000)
+                low, high = response["win_interval"]
+                self.assertTrue(low < response["win_probability"] < high)
+                with self.assertRaises(ValueError):
+                    client.query("AhAh")
+            latencies, wall = loadtest.run_load(path, clients=3, queries=5, rounds=200)
+            self.assertEqual(len(latencies), 15)
+            self.assertLessEqual(server.batches, 15)
+
+
+class TestStartup(unittest.TestCase):
+    def test_core_imports_without_numpy_or_pandas(self):
+        code = ("import sys, card, deck, player, playpokerround, evaluator, canonical, results; "
+                "print(sorted(m for m in ('numpy', 'pandas', 'unittest') if m in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_main_imports_without_numpy(self):
+        code = "import sys, main; print(sorted(m for m in ('numpy', 'pandas') if m in sys.modules))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_table_lookup_without_pandas(self):
+        code = "import sys, equitytable, checkpoint; print('pandas' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_table_cache_round_trip(self):
+        rank_table, flush_table = evaluator.load_tables()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables", evaluator.TABLE_CACHE)
+            self.assertIsNone(evaluator._read_cache(path))
+            evaluator._write_cache(path, rank_table, flush_table)
+            cached_rank, cached_flush = evaluator._read_cache(path)
+            self.assertEqual(cached_flush, flush_table)
+            self.assertEqual(len(cached_rank), len(rank_table))
+            self.assertTrue(all(cached_rank[key] == rank_table[key] for key in list(cached_rank)[::97]))
+            with open(path, "r+b") as f:
+                f.truncate(1000)
+            self.assertIsNone(evaluator._read_cache(path))
+
+            # Tables written with another strength encoding are rejected, even when the sizes match
+            evaluator._write_cache(path, {key: value + 1 for key, value in rank_table.items()}, flush_table)
+            self.assertIsNone(evaluator._read_cache(path))
+            evaluator._write_cache(path, rank_table, flush_table)
+            self.assertIsNotNone(evaluator._read_cache(path))
+            header = bytearray(open(path, "rb").read())
+            header[0] ^= 1 # a different fingerprint, as a change to pack() would give
+            open(path, "wb").write(bytes(header))
+            self.assertIsNone(evaluator._read_cache(path))